@@ -0,0 +1,136 @@
+from MultiExponentiation import multi_pow
+import secrets
+
+
+class BatchVerifier:
+
+    def __init__(self, p, g, y, security_bits=64):
+        """
+        Constructor of the verifier checking many ElGamal signatures under the same key at once
+        :param p: Safe prime p
+        :param g: Generator g
+        :param y: Public key y
+        :param security_bits: Bit length of random exponents, a batch containing an invalid signature
+                              passes with probability at most 2^-security_bits
+        """
+        self.p, self.g, self.y = p, g, y
+        self.security_bits = security_bits
+        self.symbol_g = self.__jacobi(g, p)
+        self.symbol_y = self.__jacobi(y, p)
+
+    def verify(self, items):
+        """
+        Method verifies signatures using randomized small-exponent batch verification.
+        Each signature satisfies y^r * r^s * g^(-h) = 1 (mod p) when valid. Every ratio is first checked
+        to be a quadratic residue using Jacobi symbols (p = 2q + 1, so the remaining check happens in the
+        subgroup of prime order q), then the product of all ratios raised to random exponents is checked
+        with one multi-exponentiation. A failing batch is bisected to find the invalid signatures.
+        :param items: List of (h, r, s) tuples - hash value and signature
+        :return: Returns list of booleans, True for valid signatures
+        """
+        results = [None] * len(items)
+        candidates = []
+
+        for i, (h, r, s) in enumerate(items):
+            if not 0 < r < self.p:
+                results[i] = self.verify_single(h, r, s)
+            elif self.__get_symbol(h, r, s) != 1:
+                results[i] = False
+            else:
+                candidates.append(i)
+
+        self.__verify_group(items, candidates, results)
+        return results
+
+    def verify_single(self, h, r, s):
+        """
+        Method verifies one signature
+        :param h: Hash value of the data
+        :param r: R component of the signature
+        :param s: S component of the signature
+        :return: Returns True if the signature is valid, False otherwise
+        """
+        return multi_pow([(self.y, r), (r, s), (self.g, -h)], self.p) == 1
+
+    def __verify_group(self, items, indexes, results):
+        """
+        Method verifies a group of signatures at once, on failure the group is split in halves
+        :param items: All verified items
+        :param indexes: Indexes of items in the group
+        :param results: List of results to be filled in
+        """
+        if len(indexes) == 0:
+            return
+
+        if len(indexes) == 1:
+            results[indexes[0]] = self.verify_single(*items[indexes[0]])
+            return
+
+        if self.__verify_batch([items[i] for i in indexes]):
+            for i in indexes:
+                results[i] = True
+            return
+
+        middle = len(indexes) // 2
+        self.__verify_group(items, indexes[:middle], results)
+        self.__verify_group(items, indexes[middle:], results)
+
+    def __verify_batch(self, batch):
+        """
+        Method checks product of (y^r * r^s * g^(-h))^t over the batch with random t
+        :param batch: List of (h, r, s) tuples
+        :return: Returns True if the batch equation holds
+        """
+        order = self.p - 1
+        exponent_y, exponent_g = 0, 0
+        pairs = []
+
+        for h, r, s in batch:
+            t = secrets.randbits(self.security_bits) | 1
+            exponent_y += t * r
+            exponent_g += t * h
+            pairs.append((r, (t * s) % order))
+
+        pairs.append((self.y, exponent_y % order))
+        pairs.append((self.g, -exponent_g % order))
+        return multi_pow(pairs, self.p) == 1
+
+    def __get_symbol(self, h, r, s):
+        """
+        Method calculates the Jacobi symbol of y^r * r^s * g^(-h) modulo p
+        :param h: Hash value of the data
+        :param r: R component of the signature
+        :param s: S component of the signature
+        :return: Returns 1 if the ratio is a quadratic residue, -1 (or 0) otherwise
+        """
+        symbol = 1
+        if r % 2:
+            symbol *= self.symbol_y
+        if s % 2:
+            symbol *= self.__jacobi(r, self.p)
+        if h % 2:
+            symbol *= self.symbol_g
+        return symbol
+
+    def __jacobi(self, a, n):
+        """
+        Method calculates the Jacobi symbol (a/n) for odd n
+        :param a: Number a
+        :param n: Odd positive number n
+        :return: Returns 1, -1 or 0
+        """
+        a %= n
+        result = 1
+
+        while a != 0:
+            while a % 2 == 0:
+                a //= 2
+                if n % 8 in (3, 5):
+                    result = -result
+
+            a, n = n, a
+            if a % 4 == 3 and n % 4 == 3:
+                result = -result
+            a %= n
+
+        return result if n == 1 else 0
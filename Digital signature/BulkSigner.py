@@ -0,0 +1,180 @@
+from DigitalSignature import DigitalSignature
+from BatchVerifier import BatchVerifier
+from FileHasher import FileHasher
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+# Signature object and hashing settings of a worker process (the key is loaded once per worker)
+worker_signature = None
+worker_hasher = None
+worker_tree_hash = False
+
+
+def init_worker(keys, table_memory, tree_hash, chunk_size, leaf_size):
+    """
+    Initializes a worker process with the shared key and hashing settings
+    :param keys: Tuple of keys (x, y, g, p), x is None for verification only
+    :param table_memory: Memory limit of fixed-base tables
+    :param tree_hash: True to use the tree hash of files
+    :param chunk_size: Size of blocks read from files
+    :param leaf_size: Size of leaves of the tree hash
+    """
+    global worker_signature, worker_hasher, worker_tree_hash
+    worker_signature = DigitalSignature.from_keys(*keys, table_memory=table_memory)
+    worker_hasher = FileHasher(chunk_size, leaf_size)
+    worker_tree_hash = tree_hash
+
+
+def sign_document(document):
+    """
+    Hashes and signs one document in the worker process
+    :param document: Tuple (document ID, path)
+    :return: Returns tuple (document ID, hash value, r, s)
+    """
+    doc_id, path = document
+    h = worker_signature.hash_file(path, worker_tree_hash, worker_hasher)
+    r, s = worker_signature.sign_hash(h)
+    return doc_id, h, r, s
+
+
+def hash_document(path):
+    """
+    Hashes one document in the worker process
+    :param path: Path to the document
+    :return: Returns the hash value or None if the document does not exist
+    """
+    if not os.path.isfile(path):
+        return None
+    return worker_signature.hash_file(path, worker_tree_hash, worker_hasher)
+
+
+class BulkSigner:
+
+    def __init__(self, signature, workers=None, tree_hash=False, file_hasher=None):
+        """
+        Constructor of the signer of many documents writing signatures into one manifest.
+        Manifest is a JSON lines file, the first line is a header describing the key and the hash,
+        every other line maps a document ID to its hash and signature (r, s).
+        :param signature: DigitalSignature with loaded keys
+        :param workers: Number of processes hashing and signing documents (number of CPUs if None)
+        :param tree_hash: True to use the parallel tree hash of documents
+        :param file_hasher: FileHasher with chunk and leaf sizes (default settings if None)
+        """
+        self.signature = signature
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.tree_hash = tree_hash
+        self.file_hasher = file_hasher if file_hasher is not None else FileHasher()
+
+    def sign(self, paths, manifest_path, ids=None):
+        """
+        Method signs documents in a process pool and writes the manifest as the signatures are ready
+        :param paths: Paths to the documents
+        :param manifest_path: Path to the created manifest
+        :param ids: IDs of the documents written into the manifest (paths are used if None)
+        :return: Returns number of signed documents
+        """
+        paths = list(paths)
+        ids = list(ids) if ids is not None else paths
+        if len(ids) != len(paths):
+            raise ValueError("Number of IDs does not match number of documents")
+
+        keys = (self.signature.x, self.signature.y, self.signature.g, self.signature.p)
+        header = {
+            "manifest": MANIFEST_VERSION,
+            "hash": "tree-sha256" if self.tree_hash else "sha256",
+            "leaf_size": self.file_hasher.leaf_size,
+            "key": self.signature.get_key_fingerprint(),
+        }
+        count = 0
+
+        with open(manifest_path, "w") as manifest:
+            manifest.write(json.dumps(header) + "\n")
+            with ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                     initargs=(keys, self.signature.table_memory, self.tree_hash,
+                                               self.file_hasher.chunk_size, self.file_hasher.leaf_size)) as executor:
+                for doc_id, h, r, s in executor.map(sign_document, zip(ids, paths), chunksize=self.__get_chunk_size(len(paths))):
+                    manifest.write(json.dumps({"id": doc_id, "hash": f"{h:064x}", "r": f"{r:x}", "s": f"{s:x}"}) + "\n")
+                    count += 1
+
+        return count
+
+    def verify(self, manifest_path, root=None, batch_size=256):
+        """
+        Method streams the manifest and verifies it batch by batch - documents are rehashed in a process pool
+        using the hash recorded in the manifest header and signatures are checked by batch verification
+        :param manifest_path: Path to the manifest
+        :param root: Directory the document IDs are relative to (IDs are used as paths if None)
+        :param batch_size: Number of manifest entries read and verified at once
+        :return: Yields tuples (document ID, True if the document and its signature are valid)
+        """
+        keys = (None, self.signature.y, self.signature.g, self.signature.p)
+        verifier = BatchVerifier(self.signature.p, self.signature.g, self.signature.y)
+
+        with open(manifest_path, "r") as manifest:
+            header = self.__read_header(manifest)
+            with ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                     initargs=(keys, self.signature.table_memory, header["hash"] == "tree-sha256",
+                                               self.file_hasher.chunk_size, header["leaf_size"])) as executor:
+                batch = []
+                for line in manifest:
+                    if line.strip():
+                        batch.append(json.loads(line))
+                    if len(batch) >= batch_size:
+                        yield from self.__verify_batch(batch, root, executor, verifier)
+                        batch = []
+
+                yield from self.__verify_batch(batch, root, executor, verifier)
+
+    def __verify_batch(self, batch, root, executor, verifier):
+        """
+        Method verifies one batch of manifest entries
+        :param batch: List of manifest entries
+        :param root: Directory the document IDs are relative to
+        :param executor: Process pool hashing the documents
+        :param verifier: BatchVerifier of the key
+        :return: Returns list of tuples (document ID, result)
+        """
+        if len(batch) == 0:
+            return []
+
+        paths = [os.path.join(root, entry["id"]) if root is not None else entry["id"] for entry in batch]
+        hashes = list(executor.map(hash_document, paths, chunksize=self.__get_chunk_size(len(paths))))
+
+        # Only documents matching the recorded hash get their signature checked
+        items, indexes = [], []
+        results = [False] * len(batch)
+        for i, (entry, h) in enumerate(zip(batch, hashes)):
+            if h is not None and h == int(entry["hash"], 16):
+                items.append((h, int(entry["r"], 16), int(entry["s"], 16)))
+                indexes.append(i)
+
+        for i, valid in zip(indexes, verifier.verify(items)):
+            results[i] = valid
+
+        return [(entry["id"], result) for entry, result in zip(batch, results)]
+
+    def __read_header(self, manifest):
+        """
+        Method reads and checks the manifest header
+        :param manifest: Opened manifest file
+        :return: Returns the header dictionary
+        """
+        header = json.loads(manifest.readline() or "{}")
+
+        if header.get("manifest") != MANIFEST_VERSION or header.get("hash") not in ("sha256", "tree-sha256"):
+            raise ValueError("Unsupported signature manifest")
+        if header.get("key") != self.signature.get_key_fingerprint():
+            raise ValueError("Manifest was signed with a different key")
+
+        return header
+
+    def __get_chunk_size(self, count):
+        """
+        Method selects number of documents sent to a worker at once
+        :param count: Number of documents
+        :return: Returns the chunk size
+        """
+        return max(1, min(16, count // (self.workers * 4)))
@@ -1,23 +1,45 @@
 import random
-import math
 import hashlib
 import re
 import os
+from GroupRegistry import GroupRegistry
+from FixedBaseTable import FixedBaseTable
+from MultiExponentiation import multi_pow
+from BatchVerifier import BatchVerifier
+from NoncePool import NoncePool
+from FileHasher import FileHasher
+from concurrent.futures import ProcessPoolExecutor
+
+# Window of fixed-base tables sized from the group (about 4x faster than pow, 2.3 MB per table at 2048 bits)
+DEFAULT_TABLE_WINDOW = 4
 
 class DigitalSignature:
 
-    def __init__(self, file_path_x=None, file_path_y=None, file_path_g=None, file_path_p=None):
+    def __init__(self, file_path_x=None, file_path_y=None, file_path_g=None, file_path_p=None, workers=None,
+                 table_memory=None, nonce_pool_depth=0, key_length=512, group_registry=None,
+                 verification_cache=None):
         """
         Constructor initializing the parameters
         for the Digital signature using ELGamal algorithm
+        :param workers: Number of processes searching for a safe prime of a new group (number of CPUs if None)
+        :param table_memory: Memory limit in bytes of each fixed-base table for g and y (0 disables the tables,
+                             None sizes the tables from the group for DEFAULT_TABLE_WINDOW bit windows).
+                             A limit too small for any window falls back to pow for signing and to multi-exponentiation
+                             for verification. Tables are built on the first use, which makes the first sign
+                             or verify slower (call prepare_tables to build them in advance).
+        :param nonce_pool_depth: Number of signing nonces precomputed in background (0 disables the pool)
+        :param key_length: Bit length of p of newly generated keys (768 - 3072 bit MODP groups are bundled)
+        :param group_registry: Registry providing the group (p, g) of new keys (GroupRegistry() if None)
+        :param verification_cache: VerificationCache of verification results (None disables caching)
         """
-        self.key_length = 512
-
+        self.__init_options(workers, table_memory, key_length, verification_cache)
         self.__load_keys(file_path_x, file_path_y, file_path_g, file_path_p)
 
         if self.p is None or self.y is None or self.g is None or self.x is None:
-            self.p, q = self.__generate_safe_prime()
-            self.g = self.__find_primitive_root(self.p, q)
+            # Skupina (p, g) se sdílí, nový pár klíčů je jediné umocnění
+            if group_registry is None:
+                group_registry = GroupRegistry(workers=self.workers)
+            self.p, self.g = group_registry.get_group(self.key_length)
 
             # Soukromý klíč x (1 < x < p-1)
             self.x = random.randint(2, self.p - 2)
@@ -30,6 +52,30 @@ class DigitalSignature:
             self.__export_key("g.txt", self.g)
             self.__export_key("p.txt", self.p)
 
+        self.__start_nonce_pool(nonce_pool_depth)
+
+    @classmethod
+    def from_keys(cls, x, y, g, p, workers=None, table_memory=None, nonce_pool_depth=0, verification_cache=None):
+        """
+        Method creates the signature object from already loaded keys (no files are read or written)
+        :param x: Private key x (None for verification only)
+        :param y: Public key y
+        :param g: Generator g
+        :param p: Safe prime p
+        :return: Returns DigitalSignature instance with the given keys
+        """
+        signature = cls.__new__(cls)
+        signature.__init_options(workers, table_memory, p.bit_length(), verification_cache)
+        signature.x, signature.y, signature.g, signature.p = x, y, g, p
+        signature.__start_nonce_pool(nonce_pool_depth)
+        return signature
+
+    def close(self):
+        """
+        Method stops the background nonce pool (if used)
+        """
+        if self.nonce_pool is not None:
+            self.nonce_pool.stop()
 
     def sign(self, data):
         """
@@ -37,18 +83,23 @@ class DigitalSignature:
         :param h: Hash value to be signed
         :return: Returns the signature (r, s)
         """
-        h = self.__hash_data(data)
-        while True:
-            k = random.randint(2, self.p - 2)
-            if self.__gcd(k, self.p - 1) == 1:
-                break
+        r, s = self.sign_hash(self.hash_data(data))
 
-        r = pow(self.g, k, self.p)
+        self.__export_signature(r, s)
+        return r, s
 
-        k_inv = pow(k, -1, self.p - 1)
-        s = (k_inv * (h - self.x * r)) % (self.p - 1)
+    def sign_file(self, path, tree_hash=False, file_hasher=None):
+        """
+        Method signs a file without loading it into memory
+        :param path: Path to the file to be signed
+        :param tree_hash: True to sign the root of the parallel tree hash instead of SHA-256 of the file
+        :param file_hasher: FileHasher with chunk/leaf size and number of threads (default settings if None)
+        :return: Returns the signature (r, s)
+        """
+        r, s = self.sign_hash(self.hash_file(path, tree_hash, file_hasher))
 
         self.__export_signature(r, s)
+        return r, s
 
     def verify_signature(self, data, file_path_signature):
         """
@@ -59,15 +110,212 @@ class DigitalSignature:
         :return: Returns True if the signature is valid, False otherwise
         """
 
-        h = self.__hash_data(data)
         r, s = self.__import_signature(file_path_signature)
 
         if r is None or s is None:
             return False
 
-        left = (pow(self.y, r, self.p) * pow(r, s, self.p)) % self.p
-        right = pow(self.g, h, self.p)
-        return left == right
+        return self.verify(data, r, s)
+
+    def verify(self, data, r, s):
+        """
+        Method verifies the signature (r, s) of the data given in memory (no signature file is read)
+        :param data: Signed data
+        :param r: R component of the signature
+        :param s: S component of the signature
+        :return: Returns True if the signature is valid, False otherwise
+        """
+        return self.verify_hash(self.hash_data(data), r, s)
+
+    def verify_file(self, path, file_path_signature, tree_hash=False, file_hasher=None):
+        """
+        Method verifies the signature of a file without loading it into memory
+        :param path: Path to the signed file
+        :param file_path_signature: Path to the signature file
+        :param tree_hash: True if the file was signed using the tree hash
+        :param file_hasher: FileHasher with the same leaf size as used for signing (default settings if None)
+        :return: Returns True if the signature is valid, False otherwise
+        """
+        r, s = self.__import_signature(file_path_signature)
+
+        if r is None or s is None:
+            return False
+
+        return self.verify_hash(self.hash_file(path, tree_hash, file_hasher), r, s)
+
+    def verify_many(self, items, workers=1):
+        """
+        Method verifies many signatures at once using randomized batch verification
+        (see BatchVerifier), results are the same as of verify_signature for every item
+        :param items: List of (data, r, s) tuples
+        :param workers: Number of processes the items are split between
+        :return: Returns list of booleans, True for valid signatures
+        """
+        hashed_items = [(self.hash_data(data), r, s) for data, r, s in items]
+        verifier = BatchVerifier(self.p, self.g, self.y)
+
+        if workers <= 1 or len(hashed_items) < 2:
+            return verifier.verify(hashed_items)
+
+        chunk_size = -(-len(hashed_items) // workers)
+        chunks = [hashed_items[i:i + chunk_size] for i in range(0, len(hashed_items), chunk_size)]
+
+        with ProcessPoolExecutor(len(chunks)) as executor:
+            return [result for chunk in executor.map(verifier.verify, chunks) for result in chunk]
+
+    def verify_hash(self, h, r, s):
+        """
+        Method verifies the signature of the hash value, using the verification cache if enabled
+        :param h: Hash value of the data
+        :param r: R component of the signature
+        :param s: S component of the signature
+        :return: Returns True if the signature is valid, False otherwise
+        """
+        if self.verification_cache is None:
+            return self.__check_signature(h, r, s)
+
+        key = (self.get_key_fingerprint(), h, r, s)
+        result = self.verification_cache.get(key)
+
+        if result is None:
+            result = self.__check_signature(h, r, s)
+            self.verification_cache.put(key, result)
+
+        return result
+
+    def prepare_tables(self):
+        """
+        Method builds the fixed-base tables of g and y (otherwise built on the first sign or verify)
+        """
+        self.__get_fixed_base_table(self.g)
+        self.__get_fixed_base_table(self.y)
+
+    def get_key_fingerprint(self):
+        """
+        Method calculates fingerprint of the public key (y, g, p)
+        :return: Returns the fingerprint as a hexadecimal string
+        """
+        if self.__key_fingerprint is None:
+            self.__key_fingerprint = hashlib.sha256(f"{self.y:x}:{self.g:x}:{self.p:x}".encode()).hexdigest()[:32]
+        return self.__key_fingerprint
+
+    def __check_signature(self, h, r, s):
+        """
+        Method checks the verification equation y^r * r^s = g^h (mod p)
+        :param h: Hash value of the data
+        :param r: R component of the signature
+        :param s: S component of the signature
+        :return: Returns True if the signature is valid, False otherwise
+        """
+        y_table, g_table = self.__get_fixed_base_table(self.y), self.__get_fixed_base_table(self.g)
+
+        if y_table is not None and g_table is not None:
+            # Fixed bases g and y use precomputed tables, only r^s needs squarings
+            left = (y_table.pow(r) * pow(r, s, self.p)) % self.p
+            return left == g_table.pow(h)
+
+        # Without tables (disabled or too small for any window) the check is rewritten to y^r * r^s * g^(-h) = 1 (mod p)
+        # so that all three exponentiations share a single chain of squarings
+        return multi_pow([(self.y, r), (r, s), (self.g, -h)], self.p) == 1
+
+    def sign_hash(self, h):
+        """
+        Method signs the hash value h using the private key x
+        :param h: Hash value to be signed
+        :return: Returns the signature (r, s)
+        """
+        if self.nonce_pool is not None:
+            k, r, k_inv = self.nonce_pool.take()
+        else:
+            k, r, k_inv = self.__create_nonce()
+
+        s = (k_inv * (h - self.x * r)) % (self.p - 1)
+        return r, s
+
+    def hash_file(self, path, tree_hash=False, file_hasher=None):
+        """
+        Hashes the file with bounded memory
+        :param path: Path to the file
+        :param tree_hash: True to use the parallel tree hash
+        :param file_hasher: FileHasher to be used (default settings if None)
+        :return: Returns the hash value as an integer
+        """
+        if file_hasher is None:
+            file_hasher = FileHasher()
+
+        digest = file_hasher.tree_hash_file(path) if tree_hash else file_hasher.hash_file(path)
+        return int.from_bytes(digest, "big")
+
+    def __init_options(self, workers, table_memory, key_length, verification_cache):
+        """
+        Method sets options of the instance
+        :param workers: Number of processes searching for a safe prime
+        :param table_memory: Memory limit of each fixed-base table (None to size it from the group)
+        :param key_length: Bit length of p
+        :param verification_cache: Cache of verification results (None disables caching)
+        """
+        self.key_length = key_length
+        self.verification_cache = verification_cache
+        self.__key_fingerprint = None
+        self.workers = workers
+        self.table_memory = table_memory
+        self.__fixed_base_tables = {}
+
+    def __start_nonce_pool(self, depth):
+        """
+        Method starts the background nonce pool
+        :param depth: Number of precomputed nonces (0 disables the pool)
+        """
+        self.nonce_pool = None
+        if depth > 0:
+            self.nonce_pool = NoncePool(self.__create_nonce, depth)
+            self.nonce_pool.start()
+
+    def __create_nonce(self):
+        """
+        Method creates a one-time signing nonce, it does not depend on the signed data
+        :return: Returns k coprime to p - 1, r = g^k mod p and inverse of k modulo p - 1
+        """
+        while True:
+            k = random.randint(2, self.p - 2)
+            if self.__gcd(k, self.p - 1) == 1:
+                break
+
+        r = self.__fixed_base_pow(self.g, k)
+        k_inv = pow(k, -1, self.p - 1)
+        return k, r, k_inv
+
+    def __fixed_base_pow(self, base, exponent):
+        """
+        Method computes base^exponent mod p for a fixed base (g or y) using a precomputed table.
+        Tables are built lazily on the first use and reused by all following calls.
+        :param base: Fixed base (g or y)
+        :param exponent: Exponent
+        :return: Returns base^exponent mod p
+        """
+        table = self.__get_fixed_base_table(base)
+        return pow(base, exponent, self.p) if table is None else table.pow(exponent)
+
+    def __get_fixed_base_table(self, base):
+        """
+        Method returns the precomputed table of the fixed base (g or y), the table is built on the first use
+        :param base: Fixed base (g or y)
+        :return: Returns FixedBaseTable, None if the tables are disabled or the memory limit does not fit any window
+        """
+        if self.table_memory is not None and self.table_memory <= 0:
+            return None
+
+        table = self.__fixed_base_tables.get(base)
+
+        if table is None or table.modulus != self.p:
+            memory = self.table_memory
+            if memory is None:
+                memory = FixedBaseTable.get_table_memory(self.p, self.p.bit_length(), DEFAULT_TABLE_WINDOW)
+
+            table = FixedBaseTable(base, self.p, self.p.bit_length(), memory, order=self.p - 1)
+            self.__fixed_base_tables[base] = table
+
+        return table if table.window > 0 else None
 
     def __load_keys(self, file_path_x, file_path_y, file_path_g, file_path_p):
         """
@@ -164,7 +412,7 @@ class DigitalSignature:
             return False
         return os.path.isfile(file_path)
 
-    def __hash_data(self, data):
+    def hash_data(self, data):
         """
         Hashes the input data using SHA-256
         :param data: Data to be hashed
@@ -183,84 +431,3 @@ class DigitalSignature:
         while b:
             a, b = b, a % b
         return a
-
-    def __generate_safe_prime(self):
-        """
-        Generates a safe prime p
-        such that p = 2q + 1 and both p and q are prime
-        :return: Returns the safe prime p and its corresponding q
-        """
-        while True:
-            q = self.__generate_prime()
-            p = 2 * q + 1
-            if self.__is_prime(p):
-                return p, q
-
-    def __find_primitive_root(self, p, q):
-        """
-        Finds a primitive root g modulo p
-        :param p: Parameter p
-        :param q: Parameter q
-        :return: Returns the primitive root g
-        """
-        for g in range(2, p):
-            if pow(g, 2, p) != 1 and pow(g, q, p) != 1:
-                return g
-        raise ValueError("No primitive root found")
-
-    def __is_prime(self, n):
-        """
-        Method checks if number n is prime using Miller-Rabin primality test
-        with trial division optimization
-        :param n: Number to be checked
-        :return: Returns True if n is prime, False otherwise
-        """
-        # Check small primes and obvious cases
-        if n <= 1:
-            return False
-        if n <= 3:
-            return True
-        if n % 2 == 0:
-            return False
-
-        # Try division by first few primes
-        small_primes = [3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53]
-        for prime in small_primes:
-            if n % prime == 0:
-                return n == prime
-
-        # Miller-Rabin test
-        r, d = 0, n - 1
-        while d % 2 == 0:
-            d //= 2
-            r += 1
-
-        rounds = min(40, 2 * int(math.log2(self.key_length)))
-
-        for _ in range(rounds):
-            a = random.randrange(2, n - 1)
-            x = pow(a, d, n)
-            if x == 1 or x == n - 1:
-                continue
-
-            for _ in range(r - 1):
-                x = pow(x, 2, n)
-                if x == n - 1:
-                    break
-            else:
-                return False
-
-        return True
-
-    def __generate_prime(self):
-       """
-       Method generates random prime number with optimizations
-       :return: Returns a prime number
-       """
-       while True:
-           candidate = random.getrandbits(self.key_length - 1)
-           candidate = (candidate << 1) | 1  # Set LSB to 1 to make odd
-           candidate |= (1 << (self.key_length - 1))  # Set MSB to 1
-           if self.__is_prime(candidate):
-               return candidate
-
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+
+
+class FileHasher:
+
+    def __init__(self, chunk_size=1 << 20, leaf_size=1 << 22, workers=None):
+        """
+        Constructor of the hasher of large files with bounded memory
+        :param chunk_size: Size of blocks read from the file
+        :param leaf_size: Size of leaves of the tree hash
+        :param workers: Number of threads hashing leaves (number of CPUs if None)
+        """
+        self.chunk_size = chunk_size
+        self.leaf_size = leaf_size
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+
+    def hash_file(self, path):
+        """
+        Method hashes the whole file using SHA-256, reading it block by block
+        (the result is the same as SHA-256 of the file loaded into memory)
+        :param path: Path to the file
+        :return: Returns the digest as bytes
+        """
+        digest = hashlib.sha256()
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+
+        with open(path, "rb", buffering=0) as file:
+            while True:
+                length = file.readinto(buffer)
+                if not length:
+                    break
+                digest.update(view[:length])
+
+        return digest.digest()
+
+    def tree_hash_file(self, path):
+        """
+        Method hashes the file as a tree - leaves of leaf_size bytes are hashed in parallel
+        (hashlib releases the GIL while hashing) and the root is hashed from the leaf digests.
+        leaf = SHA-256(0x00 || leaf data)
+        root = SHA-256(0x01 || leaf size || file size || leaf digests)
+        :param path: Path to the file
+        :return: Returns the root digest as bytes
+        """
+        size = os.path.getsize(path)
+        leaves = range(0, max(size, 1), self.leaf_size)
+
+        file = open(path, "rb", buffering=0)
+        try:
+            with ThreadPoolExecutor(self.workers) as executor:
+                digests = list(executor.map(lambda offset: self.__hash_leaf(file.fileno(), offset, size), leaves))
+        finally:
+            file.close()
+
+        root = hashlib.sha256(b"\x01")
+        root.update(self.leaf_size.to_bytes(8, "big"))
+        root.update(size.to_bytes(8, "big"))
+        for digest in digests:
+            root.update(digest)
+
+        return root.digest()
+
+    def __hash_leaf(self, descriptor, offset, size):
+        """
+        Method hashes one leaf of the file
+        :param descriptor: File descriptor
+        :param offset: Offset of the leaf
+        :param size: Size of the file
+        :return: Returns the leaf digest
+        """
+        digest = hashlib.sha256(b"\x00")
+        end = min(offset + self.leaf_size, size)
+
+        while offset < end:
+            data = os.pread(descriptor, min(self.chunk_size, end - offset), offset)
+            if not data:
+                break
+            digest.update(data)
+            offset += len(data)
+
+        return digest.digest()
@@ -0,0 +1,103 @@
+import sys
+
+
+class FixedBaseTable:
+
+    def __init__(self, base, modulus, exponent_bits, max_memory, order=None, max_window=8):
+        """
+        Constructor precomputing the table for fixed-base windowed exponentiation.
+        For window w the table holds base^(j * 2^(w*i)) for every window i of the exponent
+        and every digit j, so an exponentiation needs no squarings, only one multiplication per window.
+        :param base: Fixed base
+        :param modulus: Modulus
+        :param exponent_bits: Maximal bit length of exponents
+        :param max_memory: Maximal memory used by the table in bytes (the widest fitting window is used)
+        :param order: Exponents are reduced modulo order (e.g. p - 1 for a prime modulus p), None for no reduction
+        :param max_window: Maximal window width in bits
+        """
+        self.base = base % modulus
+        self.modulus = modulus
+        self.exponent_bits = exponent_bits
+        self.order = order
+        self.window = self.__get_window(exponent_bits, max_memory, max_window)
+        self.table = self.__build_table() if self.window > 0 else None
+
+    def pow(self, exponent):
+        """
+        Method computes base^exponent mod modulus
+        :param exponent: Non-negative exponent
+        :return: Returns the result of exponentiation
+        """
+        if self.order is not None:
+            exponent %= self.order
+
+        if self.table is None or exponent.bit_length() > self.exponent_bits:
+            return pow(self.base, exponent, self.modulus)
+
+        result = 1
+        mask = (1 << self.window) - 1
+
+        for row in self.table:
+            if exponent == 0:
+                break
+
+            digit = exponent & mask
+            if digit:
+                result = (result * row[digit]) % self.modulus
+            exponent >>= self.window
+
+        return result
+
+    def get_memory(self):
+        """
+        Method estimates memory used by the table
+        :return: Returns size of the table in bytes
+        """
+        if self.table is None:
+            return 0
+        return len(self.table) * ((1 << self.window) - 1) * sys.getsizeof(self.modulus)
+
+    @staticmethod
+    def get_table_memory(modulus, exponent_bits, window):
+        """
+        Estimates memory of a table with the given window
+        :param modulus: Modulus
+        :param exponent_bits: Maximal bit length of exponents
+        :param window: Window width in bits
+        :return: Returns size of the table in bytes
+        """
+        return -(-exponent_bits // window) * ((1 << window) - 1) * sys.getsizeof(modulus)
+
+    def __get_window(self, exponent_bits, max_memory, max_window):
+        """
+        Method selects the widest window whose table fits into the memory limit
+        :param exponent_bits: Maximal bit length of exponents
+        :param max_memory: Memory limit in bytes
+        :param max_window: Maximal window width
+        :return: Returns window width in bits (0 if not even 1 bit windows fit)
+        """
+        for window in range(max_window, 0, -1):
+            if self.get_table_memory(self.modulus, exponent_bits, window) <= max_memory:
+                return window
+
+        return 0
+
+    def __build_table(self):
+        """
+        Method builds rows of the table, row i contains base^(j * 2^(w*i)) for j = 0 .. 2^w - 1
+        :return: Returns list of rows
+        """
+        rows = -(-self.exponent_bits // self.window)
+        table = []
+        row_base = self.base
+
+        for _ in range(rows):
+            row = [1, row_base]
+            for _ in range(2, 1 << self.window):
+                row.append((row[-1] * row_base) % self.modulus)
+            table.append(row)
+
+            # base^(2^(w*(i+1))) = (last entry) * row base
+            row_base = (row[-1] * row_base) % self.modulus
+
+        return table
@@ -0,0 +1,141 @@
+from SafePrimeGenerator import SafePrimeGenerator
+import json
+import os
+
+# Offsets of MODP groups from RFC 2409 and RFC 3526 by bit length,
+# p = 2^n - 2^(n-64) - 1 + 2^64 * (floor(2^(n-130) * pi) + offset)
+MODP_OFFSETS = {768: 149686, 1024: 129093, 1536: 741804, 2048: 124476, 3072: 1690314}
+
+
+class GroupRegistry:
+
+    # Groups (p, g) already loaded in this process, shared by all registries
+    groups = {}
+
+    def __init__(self, cache_path="groups.json", workers=None):
+        """
+        Constructor of the registry of group parameters (safe prime p and its primitive root g).
+        Standard MODP groups are bundled, groups of other sizes are generated once and cached on disk,
+        so a new key pair only needs one exponentiation y = g^x mod p.
+        :param cache_path: Path to the file caching generated groups
+        :param workers: Number of processes searching for a safe prime of a new group
+        """
+        self.cache_path = cache_path
+        self.workers = workers
+
+    def get_group(self, key_length):
+        """
+        Method returns the group of the given size, a group that is neither bundled
+        nor cached is generated and stored in the cache
+        :param key_length: Bit length of the safe prime p
+        :return: Returns tuple (p, g)
+        """
+        key = (key_length, self.cache_path if key_length not in MODP_OFFSETS else None)
+        if key in self.groups:
+            return self.groups[key]
+
+        if key_length in MODP_OFFSETS:
+            p = self.get_modp_prime(key_length)
+            group = p, self.find_primitive_root(p, (p - 1) // 2)
+        else:
+            group = self.__get_cached_group(key_length)
+
+        self.groups[key] = group
+        return group
+
+    def get_sizes(self):
+        """
+        Method lists sizes of groups available without generating a safe prime
+        :return: Returns sorted list of bit lengths
+        """
+        return sorted(set(MODP_OFFSETS) | {int(size) for size in self.__load_cache()})
+
+    @staticmethod
+    def get_modp_prime(key_length):
+        """
+        Calculates the safe prime of the MODP group of the given size
+        :param key_length: Bit length of the group (768, 1024, 1536, 2048 or 3072)
+        :return: Returns the safe prime p
+        """
+        if key_length not in MODP_OFFSETS:
+            raise ValueError(f"No MODP group of {key_length} bits")
+
+        pi = GroupRegistry.__calculate_pi(key_length - 130)
+        return (1 << key_length) - (1 << (key_length - 64)) - 1 + ((pi + MODP_OFFSETS[key_length]) << 64)
+
+    @staticmethod
+    def find_primitive_root(p, q):
+        """
+        Finds the smallest primitive root g modulo safe prime p = 2q + 1
+        :param p: Parameter p
+        :param q: Parameter q
+        :return: Returns the primitive root g
+        """
+        for g in range(2, p):
+            if pow(g, 2, p) != 1 and pow(g, q, p) != 1:
+                return g
+        raise ValueError("No primitive root found")
+
+    @staticmethod
+    def __calculate_pi(bits):
+        """
+        Calculates floor(2^bits * pi) using Machin's formula pi = 16 atan(1/5) - 4 atan(1/239)
+        :param bits: Number of bits after the binary point
+        :return: Returns pi as a fixed point integer
+        """
+        guard = 64
+        one = 1 << (bits + guard)
+
+        def arctan_inverse(x):
+            power, total, k, sign = one // x, 0, 1, 1
+            while power:
+                total += sign * (power // k)
+                power //= x * x
+                k += 2
+                sign = -sign
+            return total
+
+        return (16 * arctan_inverse(5) - 4 * arctan_inverse(239)) >> guard
+
+    def __get_cached_group(self, key_length):
+        """
+        Method loads the group from the cache, a missing group is generated and saved
+        :param key_length: Bit length of the safe prime p
+        :return: Returns tuple (p, g)
+        """
+        cache = self.__load_cache()
+        entry = cache.get(str(key_length))
+        if entry is not None:
+            return int(entry["p"], 16), int(entry["g"], 16)
+
+        p, q = SafePrimeGenerator(key_length, self.workers).generate()
+        g = self.find_primitive_root(p, q)
+
+        # The cache could have been extended by another process in the meantime
+        cache = self.__load_cache()
+        cache.setdefault(str(key_length), {"p": f"{p:x}", "g": f"{g:x}"})
+        self.__save_cache(cache)
+
+        entry = cache[str(key_length)]
+        return int(entry["p"], 16), int(entry["g"], 16)
+
+    def __load_cache(self):
+        """
+        Method reads the cache of generated groups
+        :return: Returns dictionary mapping bit length to hexadecimal p and g
+        """
+        if not os.path.isfile(self.cache_path):
+            return {}
+
+        with open(self.cache_path, "r") as file:
+            return json.load(file)
+
+    def __save_cache(self, cache):
+        """
+        Method writes the cache of generated groups (through a temporary file, so readers never see a partial file)
+        :param cache: Dictionary mapping bit length to hexadecimal p and g
+        """
+        temporary_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(cache, file, indent=1)
+        os.replace(temporary_path, self.cache_path)
@@ -0,0 +1,77 @@
+def multi_pow(pairs, modulus, window=None):
+    """
+    Computes product of base^exponent mod modulus over all pairs using interleaved
+    windowed multi-exponentiation (generalized Shamir's trick) - all exponentiations
+    share a single chain of squarings, each base only adds one multiplication per window
+    :param pairs: List of (base, exponent) pairs, negative exponents use the inverse of the base
+    :param modulus: Modulus
+    :param window: Window width in bits (chosen by the exponent length if None)
+    :return: Returns product of all powers modulo modulus
+    """
+    bases, exponents = [], []
+
+    for base, exponent in pairs:
+        if exponent < 0:
+            base, exponent = pow(base, -1, modulus), -exponent
+        if exponent == 0:
+            continue
+        bases.append(base % modulus)
+        exponents.append(exponent)
+
+    if len(exponents) == 0:
+        return 1 % modulus
+
+    length = max(exponent.bit_length() for exponent in exponents)
+
+    if window is None:
+        window = get_window(length, len(exponents))
+
+    mask = (1 << window) - 1
+    tables = [get_powers(base, window, modulus) for base in bases]
+    result = 1
+
+    for position in range(-(-length // window) * window - window, -1, -window):
+        if result != 1:
+            for _ in range(window):
+                result = (result * result) % modulus
+
+        for table, exponent in zip(tables, exponents):
+            digit = (exponent >> position) & mask
+            if digit:
+                result = (result * table[digit]) % modulus
+
+    return result
+
+
+def get_window(length, count):
+    """
+    Chooses window width minimizing the number of multiplications
+    (precomputation of 2^w powers per base against one multiplication per window and base)
+    :param length: Bit length of the longest exponent
+    :param count: Number of bases
+    :return: Returns window width in bits
+    """
+    best_window, best_cost = 1, None
+
+    for window in range(1, 9):
+        cost = count * ((1 << window) - 2) + count * -(-length // window)
+        if best_cost is None or cost < best_cost:
+            best_window, best_cost = window, cost
+
+    return best_window
+
+
+def get_powers(base, window, modulus):
+    """
+    Computes table of powers base^0 .. base^(2^window - 1)
+    :param base: Base
+    :param window: Window width in bits
+    :param modulus: Modulus
+    :return: Returns list of powers
+    """
+    powers = [1, base]
+
+    for _ in range(2, 1 << window):
+        powers.append((powers[-1] * base) % modulus)
+
+    return powers
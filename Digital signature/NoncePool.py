@@ -0,0 +1,108 @@
+from collections import deque
+import threading
+import time
+
+
+class NoncePool:
+
+    def __init__(self, create_nonce, depth):
+        """
+        Constructor of the pool of precomputed signing nonces, filled by a background thread
+        :param create_nonce: Function returning a new nonce triple (k, r = g^k mod p, k^-1 mod (p - 1))
+        :param depth: Maximal number of precomputed nonces
+        """
+        self.create_nonce = create_nonce
+        self.depth = depth
+        self.nonces = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        self.produced = 0
+        self.taken = 0
+        self.underruns = 0
+        self.refill_time = 0.0
+        self.started = None
+
+    def start(self):
+        """
+        Method starts the background thread refilling the pool
+        """
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.__refill, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Method stops the background thread and discards unused nonces (they are never handed out later)
+        """
+        with self.condition:
+            self.running = False
+            self.nonces.clear()
+            self.condition.notify_all()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def take(self):
+        """
+        Method removes one nonce from the pool, every nonce is handed out exactly once.
+        If the pool is empty (underrun) the nonce is computed right away.
+        :return: Returns nonce triple (k, r, k^-1 mod (p - 1))
+        """
+        with self.condition:
+            if len(self.nonces) > 0:
+                self.taken += 1
+                nonce = self.nonces.popleft()
+                self.condition.notify_all()
+                return nonce
+
+            self.underruns += 1
+
+        return self.create_nonce()
+
+    def get_stats(self):
+        """
+        Method returns metrics of the pool
+        :return: Returns dictionary with pool fill, number of produced/taken nonces,
+                 underruns and refill rate (nonces per second while refilling)
+        """
+        with self.condition:
+            requests = self.taken + self.underruns
+            return {
+                "depth": self.depth,
+                "available": len(self.nonces),
+                "produced": self.produced,
+                "taken": self.taken,
+                "underruns": self.underruns,
+                "underrun_ratio": self.underruns / requests if requests > 0 else 0.0,
+                "refill_rate": self.produced / self.refill_time if self.refill_time > 0 else 0.0,
+                "uptime": time.perf_counter() - self.started if self.started is not None else 0.0,
+            }
+
+    def __refill(self):
+        """
+        Method of the background thread, keeps the pool filled up to its depth
+        """
+        while True:
+            with self.condition:
+                while self.running and len(self.nonces) >= self.depth:
+                    self.condition.wait()
+                if not self.running:
+                    return
+
+            start = time.perf_counter()
+            nonce = self.create_nonce()
+
+            with self.condition:
+                self.refill_time += time.perf_counter() - start
+                if not self.running:
+                    return
+                self.nonces.append(nonce)
+                self.produced += 1
@@ -0,0 +1,190 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+import random
+import math
+import os
+
+# Set by the process pool initializer, tells workers that another worker already found a safe prime
+stop_event = None
+
+
+def init_worker(event):
+    """
+    Initializer of worker processes
+    :param event: Event shared by all workers of the search
+    """
+    global stop_event
+    stop_event = event
+
+
+class SafePrimeGenerator:
+
+    def __init__(self, key_length, workers=None, window_size=16384, sieve_limit=16384):
+        """
+        Constructor of the generator of safe primes p = 2q + 1
+        :param key_length: Bit length of the safe prime p
+        :param workers: Number of worker processes (number of CPUs if None, 1 searches in this process)
+        :param window_size: Number of candidates q sieved at once
+        :param sieve_limit: Upper bound of small primes used for sieving
+        """
+        self.key_length = key_length
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.window_size = window_size
+        self.rounds = min(40, 2 * int(math.log2(key_length)))
+
+        # Small primes have to stay below q, otherwise q itself would be sieved out
+        self.small_primes = self.__get_small_primes(min(sieve_limit, 1 << (key_length - 3)))
+
+        self.stats = {"windows": 0, "candidates_sieved": 0, "fermat_tests": 0, "miller_rabin_calls": 0}
+
+    def generate(self):
+        """
+        Method generates a safe prime, with more workers the first found prime wins
+        and the remaining workers are stopped
+        :return: Returns the safe prime p and its corresponding q
+        """
+        if self.workers == 1:
+            p, q, stats = self.search(random.getrandbits(64))
+            self.__add_stats(stats)
+            return p, q
+
+        event = multiprocessing.get_context().Event()
+        executor = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(event,))
+        futures = [executor.submit(self.search, random.getrandbits(64)) for _ in range(self.workers)]
+
+        wait(futures, return_when=FIRST_COMPLETED)
+        event.set()
+        executor.shutdown(wait=True)
+
+        result = None
+        for future in futures:
+            p, q, stats = future.result()
+            self.__add_stats(stats)
+
+            if result is None and p is not None:
+                result = p, q
+
+        return result
+
+    def search(self, seed):
+        """
+        Method searches windows of candidates until a safe prime is found (or the search is stopped).
+        Both q and 2q + 1 are sieved by small primes, survivors are checked by the base 2 Fermat test
+        on p and only then by the Miller-Rabin test on q. When q is prime and 2^(p-1) = 1 (mod p),
+        p is prime by Pocklington's criterion (p - 1 = 2q with q > sqrt(p), gcd(2^2 - 1, p) = 1).
+        :param seed: Seed of the random generator of this search
+        :return: Returns p, q and statistics (p and q are None if the search was stopped)
+        """
+        generator = random.Random(seed)
+        stats = {"windows": 0, "candidates_sieved": 0, "fermat_tests": 0, "miller_rabin_calls": 0}
+
+        while stop_event is None or not stop_event.is_set():
+            base = generator.getrandbits(self.key_length - 1)
+            base |= (1 << (self.key_length - 2)) | 1  # q has MSB set and is odd
+
+            sieve = self.__sieve_window(base)
+            stats["windows"] += 1
+            stats["candidates_sieved"] += self.window_size
+
+            for i in range(self.window_size):
+                if not sieve[i]:
+                    continue
+
+                if stop_event is not None and stop_event.is_set():
+                    break
+
+                q = base + 2 * i
+                p = 2 * q + 1
+
+                if q.bit_length() != self.key_length - 1:
+                    break
+
+                stats["fermat_tests"] += 1
+                if pow(2, p - 1, p) != 1:
+                    continue
+
+                stats["miller_rabin_calls"] += 1
+                if self.is_prime(q, generator):
+                    return p, q, stats
+
+        return None, None, stats
+
+    def is_prime(self, n, generator=random):
+        """
+        Method checks if number n is prime using Miller-Rabin primality test
+        :param n: Number to be checked
+        :param generator: Random generator used for bases of the test
+        :return: Returns True if n is prime, False otherwise
+        """
+        if n <= 3:
+            return n > 1
+        if n % 2 == 0:
+            return False
+
+        r, d = 0, n - 1
+        while d % 2 == 0:
+            d //= 2
+            r += 1
+
+        for _ in range(self.rounds):
+            a = generator.randrange(2, n - 1)
+            x = pow(a, d, n)
+            if x == 1 or x == n - 1:
+                continue
+
+            for _ in range(r - 1):
+                x = pow(x, 2, n)
+                if x == n - 1:
+                    break
+            else:
+                return False
+
+        return True
+
+    def __sieve_window(self, base):
+        """
+        Method marks candidates q = base + 2i for which q or 2q + 1 is divisible by a small prime
+        :param base: Odd base of the window
+        :return: Returns bytearray where 1 means the candidate survived
+        """
+        sieve = bytearray(b"\x01") * self.window_size
+
+        for prime in self.small_primes:
+            remainder = base % prime
+            half = (prime + 1) // 2  # inverse of 2 modulo prime
+
+            # q = 0 (mod prime)
+            start = (-remainder * half) % prime
+            sieve[start::prime] = bytes(len(range(start, self.window_size, prime)))
+
+            # 2q + 1 = 0 (mod prime), i.e. q = (prime - 1) / 2 (mod prime)
+            start = (((prime - 1) // 2 - remainder) * half) % prime
+            sieve[start::prime] = bytes(len(range(start, self.window_size, prime)))
+
+        return sieve
+
+    def __get_small_primes(self, limit):
+        """
+        Method finds odd primes below the limit using the sieve of Eratosthenes
+        :param limit: Upper bound
+        :return: Returns list of odd primes
+        """
+        if limit < 3:
+            return []
+
+        sieve = bytearray(b"\x01") * limit
+        sieve[0:2] = b"\x00\x00"
+
+        for i in range(2, math.isqrt(limit - 1) + 1):
+            if sieve[i]:
+                sieve[i * i::i] = bytes(len(range(i * i, limit, i)))
+
+        return [i for i in range(3, limit) if sieve[i]]
+
+    def __add_stats(self, stats):
+        """
+        Method adds statistics of one search to the generator's statistics
+        :param stats: Statistics returned by search
+        """
+        for key, value in stats.items():
+            self.stats[key] += value
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class VerificationCache:
+
+    def __init__(self, max_size=4096, ttl=None):
+        """
+        Constructor of the bounded LRU cache of signature verification results
+        :param max_size: Maximal number of cached results, the least recently used result is evicted first
+        :param ttl: Time in seconds a result stays valid (None for no expiration)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Method looks up the cached result
+        :param key: Tuple (key fingerprint, hash value, r, s)
+        :return: Returns cached result (True/False) or None on a miss
+        """
+        with self.lock:
+            entry = self.results.get(key)
+
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self.results[key]
+                self.expired += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.results.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        """
+        Method stores the verification result
+        :param key: Tuple (key fingerprint, hash value, r, s)
+        :param result: Result of the verification
+        """
+        with self.lock:
+            self.results[key] = (result, time.monotonic())
+            self.results.move_to_end(key)
+
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Method removes all cached results (statistics are kept)
+        """
+        with self.lock:
+            self.results.clear()
+
+    def get_stats(self):
+        """
+        Method returns statistics of the cache
+        :return: Returns dictionary with size, hits, misses, expired and evicted results and hit ratio
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.results),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups > 0 else 0.0,
+            }
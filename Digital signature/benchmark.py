@@ -0,0 +1,222 @@
+from DigitalSignature import DigitalSignature
+from SafePrimeGenerator import SafePrimeGenerator
+from GroupRegistry import GroupRegistry, MODP_OFFSETS
+from FixedBaseTable import FixedBaseTable
+from MultiExponentiation import multi_pow
+import DigitalSignature as digital_signature_module
+import SafePrimeGenerator as safe_prime_module
+import GroupRegistry as group_registry_module
+import FixedBaseTable as fixed_base_module
+import MultiExponentiation as multi_exponentiation_module
+import BatchVerifier as batch_verifier_module
+import platform
+import argparse
+import cProfile
+import random
+import json
+import time
+import sys
+
+# Modules whose calls of pow(base, exponent, modulus) are counted
+COUNTED_MODULES = [digital_signature_module, safe_prime_module, group_registry_module,
+                   fixed_base_module, multi_exponentiation_module, batch_verifier_module]
+
+# Modules whose calls of multi_pow are counted
+MULTI_POW_MODULES = [digital_signature_module, batch_verifier_module]
+
+# Counted exponentiations - built-in pow (modular inverses are not counted),
+# exponentiations using a fixed-base table and multi-exponentiations
+modexp_calls = {"pow": 0, "fixed_base": 0, "multi_exponentiation": 0}
+
+table_pow = FixedBaseTable.pow
+
+
+def counting_pow(base, exponent, modulus=None):
+    """
+    Replacement of the built-in pow counting modular exponentiations
+    """
+    if modulus is not None and exponent >= 0:
+        modexp_calls["pow"] += 1
+    return pow(base, exponent, modulus)
+
+
+def counting_table_pow(table, exponent):
+    """
+    Replacement of FixedBaseTable.pow counting exponentiations using the table
+    """
+    start = modexp_calls["pow"]
+    result = table_pow(table, exponent)
+
+    # Exponents the table does not cover fall back to the (already counted) built-in pow
+    if modexp_calls["pow"] == start:
+        modexp_calls["fixed_base"] += 1
+    return result
+
+
+def counting_multi_pow(pairs, modulus, window=None):
+    """
+    Replacement of multi_pow counting multi-exponentiations
+    """
+    modexp_calls["multi_exponentiation"] += 1
+    return multi_pow(pairs, modulus, window)
+
+
+def fetch_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark of DigitalSignature (results are printed as JSON)")
+    parser.add_argument("--seed", type=int, default=2025, help="seed of the random generator")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048], help="key sizes in bits")
+    parser.add_argument("--max-search-bits", type=int, default=512,
+                        help="largest size whose safe prime is searched for (larger sizes use bundled MODP groups)")
+    parser.add_argument("--operations", type=int, default=200, help="number of sign and verify operations per size")
+    parser.add_argument("--table-memory", type=int, default=None,
+                        help="memory limit of fixed-base tables (sized from the group if not set)")
+    parser.add_argument("--profile", default=None, help="file to dump cProfile statistics to")
+    parser.add_argument("--output", default=None, help="file to write the JSON results to (stdout if not set)")
+    return parser.parse_args()
+
+
+def measure(function):
+    """
+    Measures one call of the function
+    :param function: Function without arguments
+    :return: Returns result of the function, elapsed seconds and numbers of exponentiations by kind
+    """
+    start_calls = dict(modexp_calls)
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start, {kind: modexp_calls[kind] - start_calls[kind] for kind in modexp_calls}
+
+
+def summarize(seconds, calls, operations):
+    """
+    Summarizes a phase of repeated operations
+    :param seconds: Elapsed time of the phase
+    :param calls: Numbers of exponentiations in the phase by kind
+    :param operations: Number of operations
+    :return: Returns dictionary with time, operations per second and exponentiations per operation
+    """
+    return {
+        "operations": operations,
+        "seconds": seconds,
+        "ops_per_second": operations / seconds if seconds > 0 else 0.0,
+        "modexps_per_operation": sum(calls.values()) / operations,
+        "calls_per_operation": {kind: count / operations for kind, count in calls.items()},
+    }
+
+
+def benchmark_group(key_length, max_search_bits, seed):
+    """
+    Measures creation of the group (p, g) - safe prime search and primitive root search,
+    or calculation of the bundled MODP group
+    :param key_length: Bit length of p
+    :param max_search_bits: Largest size whose safe prime is searched for
+    :param seed: Seed of the safe prime search
+    :return: Returns statistics of the phases, p and g
+    """
+    results = {}
+
+    if key_length <= max_search_bits or key_length not in MODP_OFFSETS:
+        generator = SafePrimeGenerator(key_length, workers=1)
+        (p, q, stats), seconds, calls = measure(lambda: generator.search(seed))
+        results["safe_prime"] = dict(stats, seconds=seconds, modexp_calls=calls)
+    else:
+        p, seconds, calls = measure(lambda: GroupRegistry.get_modp_prime(key_length))
+        q = (p - 1) // 2
+        results["modp_prime"] = {"seconds": seconds, "modexp_calls": calls}
+
+    g, seconds, calls = measure(lambda: GroupRegistry.find_primitive_root(p, q))
+    results["primitive_root"] = {"seconds": seconds, "modexp_calls": calls, "g": g}
+    return results, p, g
+
+
+def benchmark_operations(p, g, operations, table_memory, generator):
+    """
+    Measures key generation, signing and verification in the group
+    :param p: Safe prime p
+    :param g: Primitive root g
+    :param operations: Number of repeated operations
+    :param table_memory: Memory limit of fixed-base tables
+    :param generator: Seeded random generator for keys and messages
+    :return: Returns statistics of the phases
+    """
+    results = {}
+
+    x = generator.randint(2, p - 2)
+    y, seconds, calls = measure(lambda: counting_pow(g, x, p))
+    results["keygen"] = {"seconds": seconds, "modexp_calls": calls}
+
+    messages = [generator.randbytes(64) for _ in range(operations)]
+    signature = DigitalSignature.from_keys(x, y, g, p, table_memory=table_memory)
+    signature.prepare_tables()  # tables are otherwise built on the first use and counted as signing time
+    hashes = [signature.hash_data(message) for message in messages]
+
+    signatures, seconds, calls = measure(lambda: [signature.sign_hash(h) for h in hashes])
+    results["sign"] = summarize(seconds, calls, operations)
+
+    for name, memory in (("verify_tables", table_memory), ("verify_multi_exponentiation", 0)):
+        verifier = DigitalSignature.from_keys(None, y, g, p, table_memory=memory)
+        verifier.prepare_tables()
+
+        valid, seconds, calls = measure(lambda: [verifier.verify_hash(h, r, s) for h, (r, s) in zip(hashes, signatures)])
+        if not all(valid):
+            raise ValueError("Signature verification failed")
+        results[name] = summarize(seconds, calls, operations)
+
+    items = [(message, r, s) for message, (r, s) in zip(messages, signatures)]
+    valid, seconds, calls = measure(lambda: signature.verify_many(items))
+    if not all(valid):
+        raise ValueError("Batch verification failed")
+    results["verify_batch"] = summarize(seconds, calls, operations)
+
+    return results
+
+
+if __name__ == "__main__":
+    arguments = fetch_arguments()
+
+    # Signing nonces come from the global generator, keys and messages from a separate seeded one
+    random.seed(arguments.seed)
+    generator = random.Random(arguments.seed)
+
+    for module in COUNTED_MODULES:
+        module.pow = counting_pow
+    for module in MULTI_POW_MODULES:
+        module.multi_pow = counting_multi_pow
+    FixedBaseTable.pow = counting_table_pow
+
+    profiler = cProfile.Profile() if arguments.profile is not None else None
+    if profiler is not None:
+        profiler.enable()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": arguments.seed,
+        "operations": arguments.operations,
+        "table_memory": arguments.table_memory,
+        "sizes": {},
+    }
+
+    for key_length in arguments.sizes:
+        group, p, g = benchmark_group(key_length, arguments.max_search_bits, arguments.seed)
+        results["sizes"][str(key_length)] = dict(
+            group, **benchmark_operations(p, g, arguments.operations, arguments.table_memory, generator))
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(arguments.profile)
+
+    for module in COUNTED_MODULES:
+        del module.pow
+    for module in MULTI_POW_MODULES:
+        module.multi_pow = multi_pow
+    FixedBaseTable.pow = table_pow
+
+    output = json.dumps(results, indent=2)
+
+    if arguments.output is None:
+        print(output)
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(output)
+        print(f"Results written to {arguments.output}", file=sys.stderr)
@@ -0,0 +1,265 @@
+import threading
+import unittest
+import tempfile
+import hashlib
+import random
+import shutil
+import time
+import sys
+import os
+
+sys.path.insert(0, "..")
+from DigitalSignature import DigitalSignature
+from SafePrimeGenerator import SafePrimeGenerator
+from GroupRegistry import GroupRegistry
+from FixedBaseTable import FixedBaseTable
+from MultiExponentiation import multi_pow
+from BatchVerifier import BatchVerifier
+from NoncePool import NoncePool
+from VerificationCache import VerificationCache
+from FileHasher import FileHasher
+from BulkSigner import BulkSigner
+
+# RFC 2409 (1024 bits) and RFC 3526 (1536, 2048 bits) MODP primes
+MODP_PRIMES = {
+    1024: "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DD"
+          "EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+          "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE65381FFFFFFFFFFFFFFFF",
+    1536: "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DD"
+          "EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+          "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F"
+          "83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA237327FFFFFFFFFFFFFFFF",
+    2048: "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DD"
+          "EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+          "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F"
+          "83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+          "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF6955817183995497CEA956AE515D2261898FA0510"
+          "15728E5A8AACAA68FFFFFFFFFFFFFFFF",
+}
+
+
+def is_probable_prime(n):
+    """
+    Miller-Rabin test with fixed bases independent of the tested code
+    """
+    if n < 2 or n % 2 == 0:
+        return n == 2
+
+    r, d = 0, n - 1
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+
+    for a in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+        x = pow(a, d, n)
+        if x in (1, n - 1) or a % n == 0:
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+
+    return True
+
+
+class DigitalSignatureTester(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        random.seed(2025)
+        cls.p, cls.g = GroupRegistry().get_group(768)
+        cls.x = random.randint(2, cls.p - 2)
+        cls.y = pow(cls.g, cls.x, cls.p)
+
+    def setUp(self):
+        # Signatures of files are written to the current directory
+        self.folder = tempfile.mkdtemp()
+        self.previous_folder = os.getcwd()
+        os.chdir(self.folder)
+        self.signature = DigitalSignature.from_keys(self.x, self.y, self.g, self.p)
+
+    def tearDown(self):
+        self.signature.close()
+        os.chdir(self.previous_folder)
+        shutil.rmtree(self.folder)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as fw:
+            fw.write(data)
+        return path
+
+    def test_safe_prime(self):
+        """
+        This test checks that the generated p = 2q + 1 is a safe prime of the requested length
+        """
+        generator = SafePrimeGenerator(256, workers=1)
+        p, q = generator.generate()
+
+        assert p.bit_length() == 256
+        assert p == 2 * q + 1
+        assert is_probable_prime(p) and is_probable_prime(q)
+
+        p, q, stats = generator.search(7)
+        assert p == 2 * q + 1 and is_probable_prime(p) and is_probable_prime(q)
+        assert stats["miller_rabin_calls"] > 0
+
+    def test_modp_primes(self):
+        """
+        This test compares the calculated MODP primes with the constants of RFC 2409 and RFC 3526
+        """
+        for key_length, prime in MODP_PRIMES.items():
+            assert GroupRegistry.get_modp_prime(key_length) == int(prime, 16)
+
+    def test_exponentiation_matches_pow(self):
+        """
+        This test compares multi-exponentiation and fixed-base tables with the built-in pow
+        """
+        p, g = self.p, self.g
+        generator = random.Random(1)
+
+        for _ in range(20):
+            pairs = [(generator.randrange(1, p), generator.randrange(-p, p)) for _ in range(generator.randint(1, 4))]
+            expected = 1
+            for base, exponent in pairs:
+                expected = expected * pow(base, exponent, p) % p
+            assert multi_pow(pairs, p) == expected
+            assert multi_pow(pairs, p, window=1) == expected
+
+        for memory in (1 << 20, 1 << 14, 0):
+            table = FixedBaseTable(g, p, p.bit_length(), memory, order=p - 1)
+            for exponent in [0, 1, p - 2, p - 1, p + 5, 1 << (p.bit_length() + 3)] + [generator.randrange(p) for _ in range(20)]:
+                assert table.pow(exponent) == pow(g, exponent, p)
+
+    def test_verify_many_matches_verify(self):
+        """
+        This test tampers some signatures (s + q, r + p, changed data) and checks that batch verification
+        gives the same result as verifying each signature, the invalid signatures are isolated by bisection
+        """
+        q = (self.p - 1) // 2
+        messages = [b"message %d" % i for i in range(40)]
+        items = [(message, *self.signature.sign(message)) for message in messages]
+
+        data, r, s = items[3]
+        items[3] = (data, r, s + q)
+        data, r, s = items[11]
+        items[11] = (data, r + self.p, s)
+        data, r, s = items[25]
+        items[25] = (data + b"x", r, s)
+
+        expected = [self.signature.verify(data, r, s) for data, r, s in items]
+        assert self.signature.verify_many(items) == expected
+        assert [i for i, valid in enumerate(expected) if not valid] == [i for i in (3, 11, 25) if not expected[i]]
+        assert not expected[11] and not expected[25]
+
+        # Tampered hash values h + 1
+        hashed_items = [(self.signature.hash_data(data), r, s) for data, r, s in items]
+        for i in (0, 17, 39):
+            h, r, s = hashed_items[i]
+            hashed_items[i] = (h + 1, r, s)
+
+        results = BatchVerifier(self.p, self.g, self.y).verify(hashed_items)
+        assert results == [self.signature.verify_hash(h, r, s) for h, r, s in hashed_items]
+        assert {i for i, valid in enumerate(results) if not valid} >= {0, 17, 39, 11, 25}
+
+    def test_nonce_pool_hands_out_each_nonce_once(self):
+        """
+        This test takes nonces from several threads and checks that no nonce is handed out twice
+        """
+        counter = iter(range(10 ** 9))
+        counter_lock = threading.Lock()
+
+        def create_nonce():
+            with counter_lock:
+                value = next(counter)
+            return value, value, value
+
+        pool = NoncePool(create_nonce, 8)
+        pool.start()
+        taken = []
+        taken_lock = threading.Lock()
+
+        def take(count):
+            nonces = [pool.take() for _ in range(count)]
+            with taken_lock:
+                taken.extend(nonces)
+
+        threads = [threading.Thread(target=take, args=(200,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        pool.stop()
+
+        assert len(taken) == 800
+        assert len(set(taken)) == 800
+
+        stats = pool.get_stats()
+        assert stats["taken"] + stats["underruns"] == 800
+        assert stats["available"] == 0
+
+    def test_sign_and_verify_file(self):
+        """
+        This test signs a file using SHA-256 and using the tree hash, a changed file must not verify
+        """
+        data = random.Random(2).randbytes(50000)
+        path = self.write_file("document.bin", data)
+        file_hasher = FileHasher(chunk_size=4096, leaf_size=8192, workers=2)
+
+        for tree_hash in (False, True):
+            self.signature.sign_file(path, tree_hash, file_hasher)
+            assert self.signature.verify_file(path, "signature.txt", tree_hash, file_hasher)
+
+            if not tree_hash:
+                assert self.signature.verify_signature(data, "signature.txt")
+                assert self.signature.hash_file(path, False, file_hasher) == int.from_bytes(hashlib.sha256(data).digest(), "big")
+
+            changed_path = self.write_file("changed.bin", data[:-1] + bytes([data[-1] ^ 1]))
+            assert not self.signature.verify_file(changed_path, "signature.txt", tree_hash, file_hasher)
+
+    def test_bulk_signer_manifest(self):
+        """
+        This test signs documents into a manifest and verifies it, a changed document must be reported
+        """
+        names = [f"doc{i}.txt" for i in range(6)]
+        for i, name in enumerate(names):
+            self.write_file(name, b"document %d\n" % i * (i + 1))
+
+        signer = BulkSigner(self.signature, workers=2)
+        assert signer.sign(names, "manifest.jsonl") == len(names)
+        assert dict(signer.verify("manifest.jsonl", root=self.folder)) == {name: True for name in names}
+
+        self.write_file(names[2], b"changed")
+        results = dict(signer.verify("manifest.jsonl", root=self.folder, batch_size=4))
+        assert results == {name: name != names[2] for name in names}
+
+    def test_verification_cache(self):
+        """
+        This test checks eviction of the least recently used result and expiration of old results
+        """
+        cache = VerificationCache(max_size=2)
+        cache.put("a", True)
+        cache.put("b", False)
+        assert cache.get("a") is True
+
+        cache.put("c", True)
+        assert cache.get("b") is None
+        assert cache.get("a") is True and cache.get("c") is True
+        assert cache.get_stats()["evictions"] == 1
+
+        cache = VerificationCache(ttl=0.05)
+        cache.put("a", True)
+        assert cache.get("a") is True
+        time.sleep(0.1)
+        assert cache.get("a") is None
+        assert cache.get_stats()["expired"] == 1
+
+        # Cached results are used by the signature
+        cache = VerificationCache()
+        signature = DigitalSignature.from_keys(None, self.y, self.g, self.p, verification_cache=cache)
+        r, s = self.signature.sign(b"data")
+        assert signature.verify(b"data", r, s) and signature.verify(b"data", r, s)
+        assert not signature.verify(b"other", r, s)
+        assert cache.get_stats()["hits"] == 1
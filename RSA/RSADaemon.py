@@ -0,0 +1,431 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from RSAModule import RSAModule
+import socketserver
+import threading
+import signal
+import argparse
+import socket
+import struct
+import queue
+import stat
+import json
+import time
+import os
+import sys
+
+OPERATION_DECRYPT = b"D"
+OPERATION_STATS = b"S"
+STATUS_OK = b"\x00"
+STATUS_ERROR = b"\x01"
+
+frame_header = struct.Struct(">I")
+
+# Key loaded in every worker process of the pool
+worker_key = None
+
+
+def init_worker(components):
+    """
+    Initializer of worker processes, keeps the private key loaded for the lifetime of the worker
+    :param components: Key components accepted by RSAModule.from_components
+    """
+    global worker_key
+    # Interrupts are handled by the main process which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_key = RSAModule.from_components(*components[:-1], other_primes=components[-1])
+
+
+def decrypt_blocks(blocks):
+    """
+    Decrypts a chunk of blocks in a worker process
+    :param blocks: List of encrypted blocks
+    :return: Returns list of decrypted blocks
+    """
+    return [worker_key.decrypt_block(block) for block in blocks]
+
+
+def send_frame(connection, data):
+    """
+    Sends length-prefixed frame
+    :param connection: Connected socket
+    :param data: Data to be sent
+    """
+    connection.sendall(frame_header.pack(len(data)) + data)
+
+
+def receive_frame(connection):
+    """
+    Receives length-prefixed frame
+    :param connection: Connected socket
+    :return: Returns received data or None if the connection was closed
+    """
+    header = receive_exactly(connection, frame_header.size)
+    if header is None:
+        return None
+    return receive_exactly(connection, frame_header.unpack(header)[0])
+
+
+def receive_exactly(connection, length):
+    """
+    Receives exactly the given number of bytes
+    :param connection: Connected socket
+    :param length: Number of bytes
+    :return: Returns received data or None if the connection was closed
+    """
+    data = bytearray()
+    while len(data) < length:
+        chunk = connection.recv(length - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+class RSADaemon:
+    """
+    Local decryption service listening on a Unix domain socket.
+    Concurrent requests are collected into micro-batches which are split
+    between worker processes that keep the private key loaded.
+    """
+
+    def __init__(self, rsa, socket_path, max_batch_size=64, max_wait=0.002, workers=None, latency_samples=10000):
+        """
+        :param rsa: RSAModule with the private key
+        :param socket_path: Path of the Unix domain socket
+        :param max_batch_size: Maximal number of requests in one batch
+        :param max_wait: Maximal time in seconds the first request of a batch waits for others
+        :param workers: Number of worker processes (number of CPUs if None)
+        :param latency_samples: Number of latest request latencies used for percentiles
+        """
+        self.rsa = rsa
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=latency_samples)
+        self.counters = {"requests": 0, "blocks": 0, "bytes": 0, "batches": 0, "errors": 0}
+        self.stats_lock = threading.Lock()
+        self.started = None
+
+        self.pool = None
+        self.completion_pool = None
+        self.batcher = None
+        self.server = None
+
+    def start(self):
+        """
+        Method starts worker processes, the batcher and the socket server (in a background thread)
+        """
+        # Only a stale socket is replaced, other files at the path are never removed
+        if os.path.lexists(self.socket_path):
+            if not stat.S_ISSOCK(os.lstat(self.socket_path).st_mode):
+                raise FileExistsError(f"{self.socket_path} exists and is not a socket")
+            os.remove(self.socket_path)
+
+        components = [self.rsa.n, self.rsa.e, self.rsa.d, self.rsa.p, self.rsa.q,
+                      self.rsa.dp, self.rsa.dq, self.rsa.q_inv, self.rsa.other_primes]
+
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(components,))
+        self.completion_pool = ThreadPoolExecutor(1)
+        self.batcher = threading.Thread(target=self.__collect_batches, daemon=True)
+        self.batcher.start()
+
+        # The socket is created accessible only by the owner, there is no window with default permissions
+        previous_umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, self.__create_handler())
+        finally:
+            os.umask(previous_umask)
+        self.server.daemon_threads = True
+
+        self.started = time.perf_counter()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """
+        Method stops the server, the batcher and worker processes
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.requests.put(None)
+        self.batcher.join()
+        self.completion_pool.shutdown()
+        self.pool.shutdown()
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def decrypt(self, data):
+        """
+        Method queues encrypted data for decryption and waits for the result
+        :param data: Encrypted data (multiple of the block length)
+        :return: Returns decrypted data
+        """
+        block_length = self.rsa.get_block_length()
+
+        if len(data) % block_length != 0:
+            raise ValueError(f"Data is expected to be padded to multiple of {block_length} bytes")
+
+        if len(data) == 0:
+            return b""
+
+        blocks = [data[i:i + block_length] for i in range(0, len(data), block_length)]
+        request = (blocks, Future(), time.perf_counter())
+        self.requests.put(request)
+        return request[1].result()
+
+    def get_stats(self):
+        """
+        Method returns counters of the daemon
+        :return: Returns dictionary with counters, throughput and p50/p99 latency in milliseconds
+        """
+        with self.stats_lock:
+            stats = dict(self.counters)
+            latencies = sorted(self.latencies)
+
+        elapsed = time.perf_counter() - self.started
+        stats["uptime"] = elapsed
+        stats["requests_per_second"] = stats["requests"] / elapsed if elapsed > 0 else 0
+        stats["blocks_per_second"] = stats["blocks"] / elapsed if elapsed > 0 else 0
+        stats["p50_ms"] = self.__percentile(latencies, 50) * 1000
+        stats["p99_ms"] = self.__percentile(latencies, 99) * 1000
+        return stats
+
+    def __collect_batches(self):
+        """
+        Method collects requests into batches - a batch is dispatched when it is full
+        or when its first request has waited for max_wait seconds
+        """
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+
+            batch = [request]
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+                if request is None:
+                    self.requests.put(None)
+                    break
+                batch.append(request)
+
+            self.__dispatch_batch(batch)
+
+    def __dispatch_batch(self, batch):
+        """
+        Method splits blocks of all requests in the batch into one chunk per worker
+        :param batch: List of requests (blocks, future, start time)
+        """
+        blocks = [block for request in batch for block in request[0]]
+        chunk_size = -(-len(blocks) // self.workers)
+        futures = [self.pool.submit(decrypt_blocks, blocks[i:i + chunk_size])
+                   for i in range(0, len(blocks), chunk_size)]
+        self.completion_pool.submit(self.__complete_batch, batch, futures)
+
+    def __complete_batch(self, batch, futures):
+        """
+        Method waits for all chunks of the batch and hands results back to requests
+        :param batch: List of requests (blocks, future, start time)
+        :param futures: Futures of the chunks in order
+        """
+        try:
+            results = [block for future in futures for block in future.result()]
+        except Exception:
+            # Fall back to single requests so one corrupted request does not fail the others
+            results = None
+
+        finished = time.perf_counter()
+        position = 0
+
+        for blocks, future, started in batch:
+            if results is not None:
+                future.set_result(b"".join(results[position:position + len(blocks)]))
+                position += len(blocks)
+                continue
+            try:
+                future.set_result(b"".join(self.pool.submit(decrypt_blocks, blocks).result()))
+            except Exception as e:
+                future.set_exception(e)
+
+        with self.stats_lock:
+            self.counters["batches"] += 1
+            for blocks, future, started in batch:
+                self.counters["requests"] += 1
+                self.counters["blocks"] += len(blocks)
+                self.counters["bytes"] += sum(len(block) for block in blocks)
+                self.counters["errors"] += future.exception() is not None
+                self.latencies.append(finished - started)
+
+    def __create_handler(self):
+        """
+        Method creates request handler class bound to this daemon
+        :return: Returns handler class for the socket server
+        """
+        daemon = self
+
+        class RequestHandler(socketserver.BaseRequestHandler):
+
+            def handle(self):
+                while True:
+                    request = receive_frame(self.request)
+                    if request is None:
+                        return
+
+                    try:
+                        if request[:1] == OPERATION_DECRYPT:
+                            response = daemon.decrypt(request[1:])
+                        elif request[:1] == OPERATION_STATS:
+                            response = json.dumps(daemon.get_stats()).encode()
+                        else:
+                            raise ValueError("Unknown operation")
+                        send_frame(self.request, STATUS_OK + response)
+                    except Exception:
+                        # No details are sent, the reason of a failed decryption must not reach the client
+                        send_frame(self.request, STATUS_ERROR)
+
+        return RequestHandler
+
+    def __percentile(self, values, percentile):
+        """
+        Method calculates percentile of sorted values (nearest rank)
+        :param values: Sorted values
+        :param percentile: Percentile (0 - 100)
+        :return: Returns the percentile or 0 for no values
+        """
+        if len(values) == 0:
+            return 0
+        rank = max(1, -(-percentile * len(values) // 100))
+        return values[int(rank) - 1]
+
+
+class RSADaemonClient:
+    """
+    Client of the RSADaemon
+    """
+
+    def __init__(self, socket_path):
+        """
+        :param socket_path: Path of the daemon's Unix domain socket
+        """
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(socket_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def decrypt(self, data):
+        """
+        Method sends encrypted data to the daemon
+        :param data: Encrypted data (multiple of the block length)
+        :return: Returns decrypted data
+        """
+        return self.__request(OPERATION_DECRYPT + data)
+
+    def decrypt_file(self, input_path, output_path):
+        """
+        Method decrypts a file encrypted by RSAModule.encrypt_data
+        :param input_path: Path to input file (data to be decrypted)
+        :param output_path: Path to output file (decrypted data)
+        """
+        input_file = open(input_path, "rb")
+        data = input_file.read()
+        input_file.close()
+
+        output_file = open(output_path, "wb")
+        output_file.write(self.decrypt(data))
+        output_file.close()
+
+    def get_stats(self):
+        """
+        Method fetches counters of the daemon
+        :return: Returns dictionary with the counters
+        """
+        return json.loads(self.__request(OPERATION_STATS))
+
+    def __request(self, data):
+        """
+        Method sends request and waits for the response
+        :param data: Request
+        :return: Returns response data
+        """
+        send_frame(self.connection, data)
+        response = receive_frame(self.connection)
+
+        if response is None:
+            raise ConnectionError("Daemon closed the connection")
+        if response[:1] != STATUS_OK:
+            raise ValueError("Request failed")
+
+        return response[1:]
+
+
+def fetch_arguments():
+    parser = argparse.ArgumentParser(description="Local RSA decryption daemon")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="run the daemon with pub_key.txt and priv_key.txt from the current directory")
+    serve.add_argument("socket")
+    serve.add_argument("--max-batch-size", type=int, default=64)
+    serve.add_argument("--max-wait-ms", type=float, default=2.0)
+    serve.add_argument("--workers", type=int, default=None)
+
+    decrypt = subparsers.add_parser("decrypt", help="decrypt a file using a running daemon")
+    decrypt.add_argument("socket")
+    decrypt.add_argument("input")
+    decrypt.add_argument("output")
+
+    stats = subparsers.add_parser("stats", help="print counters of a running daemon")
+    stats.add_argument("socket")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = fetch_arguments()
+    script_folder = os.getcwd()
+
+    if arguments.command == "serve":
+        try:
+            rsa = RSAModule.from_key_files(os.path.join(script_folder, "pub_key.txt"),
+                                           os.path.join(script_folder, "priv_key.txt"))
+        except Exception:
+            print("Key files are missing or invalid. Please encrypt a file first.")
+            sys.exit(1)
+
+        daemon = RSADaemon(rsa, arguments.socket, arguments.max_batch_size,
+                           arguments.max_wait_ms / 1000, arguments.workers)
+        daemon.start()
+        print(f"Listening on {arguments.socket}")
+
+        stop_requested = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop_requested.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop_requested.set())
+        stop_requested.wait()
+        daemon.stop()
+
+    elif arguments.command == "decrypt":
+        with RSADaemonClient(arguments.socket) as client:
+            client.decrypt_file(arguments.input, arguments.output)
+        print("Decryption complete.")
+
+    elif arguments.command == "stats":
+        with RSADaemonClient(arguments.socket) as client:
+            print(json.dumps(client.get_stats(), indent=2))
@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from RSAModule import RSAModule
+import hashlib
+import struct
+import mmap
+import os
+
+
+class RSAKeyring:
+    """
+    Binary keyring storing many RSA keys in a single memory-mapped file
+
+    Layout (all integers little endian):
+    header  - magic (8 B), version (2 B), reserved (2 B), number of keys (4 B)
+    index   - for each key sorted by key ID: key ID (16 B), entry offset (8 B), entry length (4 B)
+    entries - number of fields (2 B) followed by fields n, e, d, p, q, dp, dq, q_inv
+              and r, d_r, coefficient for every extra prime of multi-prime keys,
+              each stored as length (2 B) and big endian value (empty field = unknown value)
+    """
+
+    magic = b"RSAKRING"
+    version = 1
+    header_format = struct.Struct("<8sHHI")
+    index_format = struct.Struct("<16sQI")
+    field_length_format = struct.Struct("<H")
+    key_id_length = 16
+    base_field_count = 8
+
+    # In-process cache of loaded keys shared by all keyrings ((keyring file, key ID) -> RSAModule),
+    # the keyring file is identified by its path and modification time, so a rewritten file is not served from the cache
+    cache_size = 128
+    loaded_keys = OrderedDict()
+
+    def __init__(self, filename):
+        """
+        Method opens the keyring and maps it to memory, only the header is parsed
+        :param filename: Path to the keyring file
+        """
+        self.file = open(filename, "rb")
+        self.file_id = (os.path.realpath(filename), os.fstat(self.file.fileno()).st_mtime_ns)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < self.header_format.size:
+            self.close()
+            raise ValueError("Keyring file is too short")
+
+        magic, version, _, self.key_count = self.header_format.unpack_from(self.data, 0)
+
+        if magic != self.magic or version != self.version:
+            self.close()
+            raise ValueError("Unsupported keyring format")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.key_count
+
+    def __contains__(self, key_id):
+        return self.__find_entry(self.__to_key_id_bytes(key_id)) is not None
+
+    def close(self):
+        """
+        Method unmaps and closes the keyring file
+        """
+        self.data.close()
+        self.file.close()
+
+    def get_key(self, key_id):
+        """
+        Method looks up the key by its ID using binary search over the index,
+        only the found entry is parsed. Loaded keys are cached.
+        :param key_id: Key ID (hex string or 16 bytes)
+        :return: Returns RSAModule with the key
+        """
+        key_id = self.__to_key_id_bytes(key_id)
+        cache_key = (self.file_id, key_id)
+
+        if cache_key in self.loaded_keys:
+            self.loaded_keys.move_to_end(cache_key)
+            return self.loaded_keys[cache_key]
+
+        entry = self.__find_entry(key_id)
+
+        if entry is None:
+            raise KeyError(f"Key {key_id.hex()} not found in the keyring")
+
+        fields = self.__parse_entry(*entry)
+        other_primes = [tuple(fields[i:i + 3]) for i in range(self.base_field_count, len(fields), 3)]
+        rsa = RSAModule.from_components(*fields[:self.base_field_count], other_primes=other_primes)
+
+        self.loaded_keys[cache_key] = rsa
+        while len(self.loaded_keys) > self.cache_size:
+            self.loaded_keys.popitem(last=False)
+
+        return rsa
+
+    def get_key_ids(self):
+        """
+        Method lists IDs of all keys stored in the keyring
+        :return: Returns list of key IDs as hex strings
+        """
+        return [self.__read_index(i)[0].hex() for i in range(self.key_count)]
+
+    @staticmethod
+    def get_key_id(rsa):
+        """
+        Method calculates ID of the key from its public part
+        :param rsa: RSAModule with the key
+        :return: Returns key ID as a hex string
+        """
+        return RSAKeyring.__calculate_key_id(rsa.n, rsa.e).hex()
+
+    @staticmethod
+    def export_keyring(filename, keys):
+        """
+        Method writes keys to a new keyring file
+        :param filename: Path to the keyring file
+        :param keys: Iterable of RSAModule instances
+        """
+        entries = {}
+
+        for rsa in keys:
+            fields = [rsa.n, rsa.e, rsa.d, rsa.p, rsa.q, rsa.dp, rsa.dq, rsa.q_inv]
+            for other_prime in rsa.other_primes:
+                fields.extend(other_prime)
+            entries[RSAKeyring.__calculate_key_id(rsa.n, rsa.e)] = RSAKeyring.__serialize_entry(fields)
+
+        offset = RSAKeyring.header_format.size + len(entries) * RSAKeyring.index_format.size
+
+        exported_file = open(filename, "wb")
+        exported_file.write(RSAKeyring.header_format.pack(RSAKeyring.magic, RSAKeyring.version, 0, len(entries)))
+
+        for key_id in sorted(entries):
+            exported_file.write(RSAKeyring.index_format.pack(key_id, offset, len(entries[key_id])))
+            offset += len(entries[key_id])
+
+        for key_id in sorted(entries):
+            exported_file.write(entries[key_id])
+
+        exported_file.close()
+
+    @staticmethod
+    def __calculate_key_id(n, e):
+        """
+        Method calculates ID of the key as truncated SHA-256 of its public part
+        :param n: Modulus
+        :param e: Public exponent
+        :return: Returns key ID as bytes
+        """
+        digest = hashlib.sha256()
+        digest.update(n.to_bytes((n.bit_length() + 7) // 8, "big"))
+        digest.update(e.to_bytes((e.bit_length() + 7) // 8, "big"))
+        return digest.digest()[:RSAKeyring.key_id_length]
+
+    @staticmethod
+    def __serialize_entry(fields):
+        """
+        Method serializes integer fields of one key
+        :param fields: List of integers (None for unknown values)
+        :return: Returns serialized entry
+        """
+        entry = bytearray(RSAKeyring.field_length_format.pack(len(fields)))
+
+        for field in fields:
+            value = b"" if field is None else field.to_bytes((field.bit_length() + 7) // 8 or 1, "big")
+            entry += RSAKeyring.field_length_format.pack(len(value))
+            entry += value
+
+        return bytes(entry)
+
+    def __parse_entry(self, offset, length):
+        """
+        Method parses integer fields of one key directly from the mapped file
+        :param offset: Offset of the entry
+        :param length: Length of the entry
+        :return: Returns list of integers (None for unknown values)
+        """
+        end = offset + length
+        field_count, = self.field_length_format.unpack_from(self.data, offset)
+        offset += self.field_length_format.size
+
+        fields = []
+        for _ in range(field_count):
+            field_length, = self.field_length_format.unpack_from(self.data, offset)
+            offset += self.field_length_format.size
+
+            if offset + field_length > end:
+                raise ValueError("Keyring entry is corrupted")
+
+            fields.append(int.from_bytes(self.data[offset:offset + field_length], "big") if field_length else None)
+            offset += field_length
+
+        return fields
+
+    def __find_entry(self, key_id):
+        """
+        Method searches the sorted index for the key ID
+        :param key_id: Key ID as bytes
+        :return: Returns (offset, length) of the entry or None if not found
+        """
+        low, high = 0, self.key_count - 1
+
+        while low <= high:
+            middle = (low + high) // 2
+            current_id, offset, length = self.__read_index(middle)
+
+            if current_id == key_id:
+                return offset, length
+            if current_id < key_id:
+                low = middle + 1
+            else:
+                high = middle - 1
+
+        return None
+
+    def __read_index(self, position):
+        """
+        Method reads one record of the index
+        :param position: Position of the record
+        :return: Returns key ID, entry offset and entry length
+        """
+        return self.index_format.unpack_from(self.data, self.header_format.size + position * self.index_format.size)
+
+    def __to_key_id_bytes(self, key_id):
+        """
+        Method converts key ID to bytes
+        :param key_id: Key ID as hex string or bytes
+        :return: Returns key ID as bytes
+        """
+        if isinstance(key_id, str):
+            key_id = bytes.fromhex(key_id)
+
+        if len(key_id) != self.key_id_length:
+            raise ValueError(f"Key ID is expected to have {self.key_id_length} bytes")
+
+        return key_id
@@ -1,22 +1,103 @@
 from tqdm import tqdm
 from os import SEEK_END, SEEK_SET
+import hashlib
 import random
+import hmac
 import math
+import os
 
 
 
 class RSAModule:
 
-    def __init__(self, p=None, q=None):
-        self.number_of_rounds = 40
-        self.input_length = 256
-        self.output_length = 2048
-        self.p = p if p is not None else self.__generate_key()
-        self.q = q if q is not None else self.__generate_key()
-        self.n = self.p * self.q
-        self.phi = (self.p - 1) * (self.q - 1)
-        self.e = 65537
+    def __init__(self, p=None, q=None, num_primes=2):
+        """
+        Constructor generating the key
+        :param p: First prime factor (generated if None)
+        :param q: Second prime factor (generated if None)
+        :param num_primes: Number of prime factors of the modulus (2 to 4), extra primes are always generated
+        """
+        self.__init_parameters()
+
+        if num_primes < 2 or num_primes > self.max_primes:
+            raise ValueError(f"Number of primes is expected to be between 2 and {self.max_primes}")
+
+        if num_primes != 2 and (p is not None or q is not None):
+            raise ValueError("Primes can only be passed for two-prime keys")
+
+        prime_sizes = self.__get_prime_sizes(num_primes)
+        primes = [p, q] + [None] * (num_primes - 2)
+
+        for i in range(num_primes):
+            while primes[i] is None or primes[i] in primes[:i]:
+                primes[i] = self.__generate_key(prime_sizes[i], num_primes)
+
+        self.p, self.q = primes[0], primes[1]
+        self.n = math.prod(primes)
+        self.phi = math.prod(prime - 1 for prime in primes)
         self.d = pow(self.e, -1, self.phi)
+        self.__init_crt_parameters(primes[2:])
+
+    @classmethod
+    def from_components(cls, n, e, d, p=None, q=None, dp=None, dq=None, q_inv=None, other_primes=None):
+        """
+        Method creates the key from already known components without generating
+        primes or deriving any values (used when loading keys from a keyring)
+        :param n: Modulus
+        :param e: Public exponent
+        :param d: Private exponent
+        :param p: First prime factor of n (None if unknown)
+        :param q: Second prime factor of n (None if unknown)
+        :param dp: d mod (p - 1)
+        :param dq: d mod (q - 1)
+        :param q_inv: Inverse of q modulo p
+        :param other_primes: List of (r, d mod (r - 1), inverse of product of previous primes modulo r)
+                             for the third and following primes of multi-prime keys
+        :return: Returns RSAModule instance with the given key
+        """
+        rsa = cls.__new__(cls)
+        rsa.__init_parameters()
+        rsa.n, rsa.e, rsa.d = n, e, d
+        rsa.p, rsa.q = p, q
+        rsa.dp, rsa.dq, rsa.q_inv = dp, dq, q_inv
+        rsa.other_primes = list(other_primes) if other_primes is not None else []
+
+        if p is None or q is None:
+            rsa.phi = None
+            return rsa
+
+        rsa.phi = math.prod(prime - 1 for prime in rsa.get_primes())
+
+        if None in (dp, dq, q_inv):
+            rsa.__init_crt_parameters([r for r, _, _ in rsa.other_primes])
+
+        return rsa
+
+    @classmethod
+    def from_key_files(cls, public_key_path, private_key_path):
+        """
+        Method creates the key from exported key files without generating a new key first
+        :param public_key_path: Path to the public key file
+        :param private_key_path: Path to the private key file
+        :return: Returns RSAModule instance with the imported key
+        """
+        rsa = cls.from_components(None, None, None)
+        rsa.import_public_key(public_key_path)
+        rsa.import_private_key(private_key_path)
+
+        if rsa.n is None or rsa.e is None or rsa.d is None:
+            raise ValueError("Key files are incomplete")
+
+        return rsa
+
+    def get_primes(self):
+        """
+        Method returns all known prime factors of the modulus
+        :return: Returns list of primes (empty if the factors are unknown)
+        """
+        if self.p is None or self.q is None:
+            return []
+        return [self.p, self.q] + [r for r, _, _ in self.other_primes]
 
     def export_public_key(self, filename):
         exported_file = open(filename, 'w')
@@ -28,6 +109,15 @@ class RSAModule:
         exported_file = open(filename, 'w')
         exported_file.write(f"d={hex(self.d)}\n")
         exported_file.write(f"n={hex(self.n)}\n")
+
+        # Prime factors allow CRT decryption after import
+        primes = self.get_primes()
+        if len(primes) > 0:
+            exported_file.write(f"p={hex(primes[0])}\n")
+            exported_file.write(f"q={hex(primes[1])}\n")
+        for prime in primes[2:]:
+            exported_file.write(f"r={hex(prime)}\n")
+
         exported_file.close()
 
     def import_public_key(self, filename):
@@ -43,16 +133,106 @@ class RSAModule:
     def import_private_key(self, filename):
         imported_file = open(filename, 'r')
         lines = imported_file.readlines()
+        primes = {"p": None, "q": None, "r": []}
         for line in lines:
             if line.startswith("d="):
                 self.d = int(line.split('=')[1], 16)
             elif line.startswith("n="):
                 self.n = int(line.split('=')[1], 16)
+            elif line.startswith("p=") or line.startswith("q="):
+                primes[line[0]] = int(line.split('=')[1], 16)
+            elif line.startswith("r="):
+                primes["r"].append(int(line.split('=')[1], 16))
         imported_file.close()
 
+        self.p, self.q, self.phi = None, None, None
+        self.dp, self.dq, self.q_inv = None, None, None
+        self.other_primes = []
+
+        # Without (matching) factors decryption falls back to pow(c, d, n)
+        if primes["p"] is None or primes["q"] is None:
+            return
+
+        factors = [primes["p"], primes["q"]] + primes["r"]
+        if math.prod(factors) != self.n:
+            return
+
+        self.p, self.q = primes["p"], primes["q"]
+        self.phi = math.prod(prime - 1 for prime in factors)
+        self.__init_crt_parameters(primes["r"])
+
     def encrypt_data(self, input_path, output_path):
         """
-        Method fetches data, splits it into blocks and encrypts each block
+        Method fetches data, splits it into blocks as large as the modulus allows,
+        pads each block (OAEP) and encrypts it. The last block may be shorter.
+        :param input_path: Path to input file (data to be encrypted)
+        :param output_path: Path to output file (encrypted data)
+        """
+
+        input_file, output_file = open(input_path, "rb"), open(output_path, "wb")
+        input_byte_length = self.__get_modulus_length() - self.padding_overhead
+
+        data_length = self.__get_file_size(input_file)
+
+        for _ in tqdm(range(math.ceil(data_length / input_byte_length)), disable=not self.show_progress):
+
+            encrypted_data = self.encrypt_block(input_file.read(input_byte_length))
+            output_file.write(encrypted_data)
+
+        input_file.close()
+        output_file.close()
+
+    def decrypt_data(self, input_path, output_path):
+        """
+        Method fetches data, splits it into blocks, decrypts each block and removes its padding
+        so that the original data length is recovered
+        :param input_path: Path to input file (data to be decrypted)
+        :param output_path: Path to output file (decrypted data)
+        """
+
+        input_file, output_file = open(input_path, "rb"), open(output_path, "wb")
+        output_byte_length = self.__get_modulus_length()
+
+        data_length = self.__get_file_size(input_file)
+
+        if data_length % output_byte_length != 0:
+            raise ValueError(f"Data is expected to be padded to multiple of {output_byte_length} bytes")
+
+        for _ in tqdm(range(int(data_length/output_byte_length)), disable=not self.show_progress):
+
+            decrypted_data = self.decrypt_block(input_file.read(output_byte_length))
+            output_file.write(decrypted_data)
+
+        input_file.close()
+        output_file.close()
+
+    def encrypt_block(self, data):
+        """
+        Method pads and encrypts a single block
+        :param data: Data to be encrypted (at most modulus length - padding overhead bytes)
+        :return: Returns encrypted block with the length of the modulus
+        """
+        return self.__encrypt(self.__pad_block(data))
+
+    def decrypt_block(self, data):
+        """
+        Method decrypts a single block and removes its padding
+        :param data: Encrypted block with the length of the modulus
+        :return: Returns original data
+        """
+        decrypted_data = self.__decrypt(data).to_bytes(self.__get_modulus_length(), 'big')
+        return self.__unpad_block(decrypted_data)
+
+    def get_block_length(self):
+        """
+        Method returns length of one encrypted block
+        :return: Returns length of the modulus in bytes
+        """
+        return self.__get_modulus_length()
+
+    def encrypt_data_raw(self, input_path, output_path):
+        """
+        Method fetches data, splits it into fixed 32 byte blocks and encrypts each block without padding
         :param input_path: Path to input file (data to be encrypted)
         :param output_path: Path to output file (encrypted data)
         """
@@ -65,7 +245,7 @@ class RSAModule:
         if data_length % input_byte_length != 0:
             raise ValueError(f"Data is expected to be padded to multiple of {input_byte_length} bytes")
 
-        for _ in tqdm(range(int(data_length/input_byte_length))):
+        for _ in tqdm(range(int(data_length/input_byte_length)), disable=not self.show_progress):
 
             current_data = bytearray(input_file.read(input_byte_length))
             encrypted_data = self.__encrypt(current_data)
@@ -74,30 +254,94 @@ class RSAModule:
         input_file.close()
         output_file.close()
 
-    def decrypt_data(self, input_path, output_path):
+    def decrypt_data_raw(self, input_path, output_path):
         """
-        Method fetches data, splits it into blocks and decrypts each block
+        Method fetches data, splits it into blocks and decrypts each block into fixed 32 byte blocks
         :param input_path: Path to input file (data to be decrypted)
         :param output_path: Path to output file (decrypted data)
         """
 
         input_file, output_file = open(input_path, "rb"), open(output_path, "wb")
-        output_byte_length = (self.output_length // 8)
+        output_byte_length = self.__get_modulus_length()
 
         data_length = self.__get_file_size(input_file)
 
         if data_length % output_byte_length != 0:
             raise ValueError(f"Data is expected to be padded to multiple of {output_byte_length} bytes")
 
-        for _ in tqdm(range(int(data_length/output_byte_length))):
+        for _ in tqdm(range(int(data_length/output_byte_length)), disable=not self.show_progress):
 
             current_data = bytearray(input_file.read(output_byte_length))
-            decrypted_data = self.__decrypt(current_data)
+            decrypted_data = self.__decrypt(current_data).to_bytes(self.input_length//8, 'big')
             output_file.write(decrypted_data)
 
         input_file.close()
         output_file.close()
 
+    def __init_parameters(self):
+        """
+        Method sets parameters shared by all keys
+        """
+        self.number_of_rounds = 40
+        self.input_length = 256
+        self.output_length = 2048
+        self.hash_length = hashlib.sha256().digest_size
+        self.padding_overhead = 2 * self.hash_length + 2
+        self.max_primes = 4
+        self.e = 65537
+        self.other_primes = []
+        self.show_progress = True
+
+        # Statistics of the prime search
+        self.candidates_tested = 0
+        self.miller_rabin_rounds = 0
+
+    def __init_crt_parameters(self, other_primes):
+        """
+        Method precomputes values used for decryption using the Chinese remainder theorem
+        (RFC 8017 layout - dp, dq, q_inv and a (r, d mod (r - 1), coefficient) triplet for each extra prime)
+        :param other_primes: Third and following prime factors
+        """
+        self.dp = self.d % (self.p - 1)
+        self.dq = self.d % (self.q - 1)
+        self.q_inv = pow(self.q, -1, self.p)
+
+        self.other_primes = []
+        product = self.p * self.q
+
+        for r in other_primes:
+            self.other_primes.append((r, self.d % (r - 1), pow(product, -1, r)))
+            product *= r
+
+    def __get_prime_sizes(self, num_primes):
+        """
+        Method splits the modulus length between the primes
+        :param num_primes: Number of primes
+        :return: Returns list of bit lengths of the primes
+        """
+        base, remainder = divmod(self.output_length, num_primes)
+        return [base + (1 if i < remainder else 0) for i in range(num_primes)]
+
+    def __get_prime_lower_bound(self, key_size, num_primes):
+        """
+        Method calculates the smallest integer not lower than 2^(key_size - 1/num_primes)
+        (the num_primes-th root of 2^(num_primes * key_size - 1))
+        :param key_size: Bit length of the prime
+        :param num_primes: Number of primes of the modulus
+        :return: Returns the lower bound of the prime
+        """
+        power = 1 << (num_primes * key_size - 1)
+
+        # Newton's method for the integer root, starting above the root
+        root = 1 << key_size
+        while True:
+            next_root = ((num_primes - 1) * root + power // root ** (num_primes - 1)) // num_primes
+            if next_root >= root:
+                break
+            root = next_root
+
+        return root if root ** num_primes == power else root + 1
+
     def __get_file_size(self, file):
         """
         Method returns size of the file
@@ -111,24 +355,108 @@ class RSAModule:
 
         return data_length
 
+    def __get_modulus_length(self):
+        """
+        Method returns length of the modulus n in bytes (size of one encrypted block)
+        :return: Returns number of bytes needed to store n
+        """
+        return (self.n.bit_length() + 7) // 8
+
+    def __pad_block(self, data):
+        """
+        Method pads data to the length of the modulus using OAEP (RFC 8017, SHA-256, MGF1, empty label)
+        0x00 || masked seed || masked (label hash || zero bytes || 0x01 || data)
+        :param data: Data to be padded (at most modulus length - padding overhead bytes)
+        :return: Returns padded block
+        """
+        modulus_length = self.__get_modulus_length()
+        padding_length = modulus_length - len(data) - self.padding_overhead
+
+        if padding_length < 0:
+            raise ValueError(f"Block of {len(data)} bytes is too long for the modulus")
+
+        data_block = hashlib.sha256(b"").digest() + bytes(padding_length) + b"\x01" + data
+        seed = os.urandom(self.hash_length)
+
+        masked_data_block = self.__xor(data_block, self.__mask_generation(seed, len(data_block)))
+        masked_seed = self.__xor(seed, self.__mask_generation(masked_data_block, self.hash_length))
+
+        return b"\x00" + masked_seed + masked_data_block
+
+    def __unpad_block(self, block):
+        """
+        Method removes OAEP padding from the decrypted block. All malformed blocks fail with the same error
+        after the same checks, so the failure does not tell which part of the padding was wrong.
+        :param block: Decrypted block with the length of the modulus
+        :return: Returns original data
+        """
+        masked_seed, masked_data_block = block[1:1 + self.hash_length], block[1 + self.hash_length:]
+
+        seed = self.__xor(masked_seed, self.__mask_generation(masked_data_block, self.hash_length))
+        data_block = self.__xor(masked_data_block, self.__mask_generation(seed, len(masked_data_block)))
+
+        valid = hmac.compare_digest(data_block[:self.hash_length], hashlib.sha256(b"").digest()) & (block[0] == 0)
+        separator = data_block.find(b"\x01", self.hash_length)
+        valid &= separator >= 0 and not any(data_block[self.hash_length:separator])
+
+        if not valid:
+            raise ValueError("Decryption error")
+
+        return data_block[separator + 1:]
+
+    def __mask_generation(self, seed, length):
+        """
+        Method generates a mask of the given length from the seed (MGF1 with SHA-256)
+        :param seed: Seed of the mask
+        :param length: Length of the mask in bytes
+        :return: Returns the mask
+        """
+        mask = bytearray()
+        for counter in range(-(-length // self.hash_length)):
+            mask += hashlib.sha256(seed + counter.to_bytes(4, 'big')).digest()
+        return bytes(mask[:length])
+
+    def __xor(self, first, second):
+        """
+        Method XORs two byte strings of the same length
+        :return: Returns the result as bytes
+        """
+        return (int.from_bytes(first, 'big') ^ int.from_bytes(second, 'big')).to_bytes(len(first), 'big')
+
     def __encrypt(self, data: bytearray):
         """
         Method encrypts data using RSA algorithm
         :param data: Data to be encrypted
-        :return: Returns encrypted data padded to 256 bytes
+        :return: Returns encrypted data padded to the length of the modulus
         """
         encrypted_data = pow(int.from_bytes(data, 'big'), self.e, self.n)
-        return encrypted_data.to_bytes(self.output_length//8, 'big')
+        return encrypted_data.to_bytes(self.__get_modulus_length(), 'big')
 
     def __decrypt(self, data):
         """
         Method decrypts data using RSA algorithm
         :param data: Data to be decrypted
-        :return: Returns decrypted data
+        :return: Returns decrypted data as an integer
         """
         decrypted_data = int.from_bytes(data, 'big')
-        decrypted_data = pow(decrypted_data, self.d, self.n)
-        return int.to_bytes(decrypted_data, self.input_length//8, 'big')
+
+        if self.dp is None:
+            return pow(decrypted_data, self.d, self.n)
+
+        # CRT - one exponentiation per prime recombined using Garner's formula
+        m1 = pow(decrypted_data, self.dp, self.p)
+        m2 = pow(decrypted_data, self.dq, self.q)
+        h = (self.q_inv * (m1 - m2)) % self.p
+        m = m2 + h * self.q
+
+        product = self.p * self.q
+        for r, d_r, coefficient in self.other_primes:
+            m_r = pow(decrypted_data, d_r, r)
+            h = ((m_r - m) * coefficient) % r
+            m += product * h
+            product *= r
+
+        return m
 
     def __is_prime(self, n):
         """
@@ -158,6 +486,7 @@ class RSAModule:
         rounds = min(40, 2 * int(math.log2(self.output_length)))
 
         for _ in range(rounds):
+            self.miller_rabin_rounds += 1
             a = random.randrange(2, n - 1)
             x = pow(a, d, n)
             if x == 1 or x == n - 1:
@@ -172,17 +501,26 @@ class RSAModule:
 
         return True
 
-    def __generate_key(self):
+    def __generate_key(self, key_size=None, num_primes=2):
         """
         Method generates random prime number with optimizations
+        :param key_size: Bit length of the prime (half of the modulus length if None)
+        :param num_primes: Number of primes of the modulus, every prime is at least 2^(key_size - 1/num_primes),
+                           so the product of the primes has exactly the sum of their bit lengths
         """
 
-        key_size = self.output_length//2
+        if key_size is None:
+            key_size = self.output_length//2
+
+        lower_bound = self.__get_prime_lower_bound(key_size, num_primes)
 
         while True:
-            candidate = random.getrandbits(key_size - 1)
-            candidate = (candidate << 1) | 1  # Set LSB to 1 to make odd
-            candidate |= (1 << (key_size - 1))  # Set MSB to 1
+            candidate = random.randrange(lower_bound, 1 << key_size) | 1  # Set LSB to 1 to make odd
+
+            # e has to be invertible modulo (candidate - 1)
+            if (candidate - 1) % self.e == 0:
+                continue
 
+            self.candidates_tested += 1
             if self.__is_prime(candidate):
                 return candidate
\ No newline at end of file
@@ -0,0 +1,176 @@
+from RSAModule import RSAModule
+import statistics
+import tempfile
+import platform
+import argparse
+import random
+import json
+import time
+import sys
+import os
+
+
+def fetch_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark of RSAModule (results are printed as JSON)")
+    parser.add_argument("--seed", type=int, default=2025, help="seed of the random generator")
+    parser.add_argument("--keys", type=int, default=5, help="number of generated keys per number of primes")
+    parser.add_argument("--num-primes", type=int, nargs="+", default=[2, 3], help="numbers of primes to benchmark")
+    parser.add_argument("--blocks", type=int, default=50, help="number of blocks for per-block latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 65536, 1048576], help="file sizes in bytes")
+    parser.add_argument("--output", default=None, help="file to write the JSON results to (stdout if not set)")
+    return parser.parse_args()
+
+
+def percentile(values, percent):
+    """
+    Calculates percentile of values (nearest rank)
+    :param values: Measured values
+    :param percent: Percentile (0 - 100)
+    :return: Returns the percentile
+    """
+    values = sorted(values)
+    rank = max(1, -(-percent * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+def summarize(values):
+    """
+    Summarizes measured values
+    :param values: Measured values
+    :return: Returns dictionary with mean, p50, p95 and max
+    """
+    return {
+        "mean": statistics.mean(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values),
+    }
+
+
+def benchmark_keygen(num_primes, keys):
+    """
+    Measures key generation
+    :param num_primes: Number of primes of the modulus
+    :param keys: Number of generated keys
+    :return: Returns timing and prime search statistics, last generated key
+    """
+    times, candidates, rounds = [], [], []
+
+    for _ in range(keys):
+        start = time.perf_counter()
+        rsa = RSAModule(num_primes=num_primes)
+        times.append(time.perf_counter() - start)
+        candidates.append(rsa.candidates_tested)
+        rounds.append(rsa.miller_rabin_rounds)
+
+    results = {
+        "seconds": summarize(times),
+        "candidates_tested": summarize(candidates),
+        "miller_rabin_rounds": summarize(rounds),
+    }
+    return results, rsa
+
+
+def benchmark_blocks(rsa, blocks, generator):
+    """
+    Measures encryption and decryption of single blocks
+    :param rsa: Key to be used
+    :param blocks: Number of blocks
+    :param generator: Seeded random generator for the data
+    :return: Returns latency statistics in milliseconds
+    """
+    block_length = rsa.get_block_length() - rsa.padding_overhead
+    data = [generator.randbytes(block_length) for _ in range(blocks)]
+    encrypt_times, decrypt_times = [], []
+
+    for block in data:
+        start = time.perf_counter()
+        encrypted = rsa.encrypt_block(block)
+        encrypt_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        decrypted = rsa.decrypt_block(encrypted)
+        decrypt_times.append((time.perf_counter() - start) * 1000)
+
+        if decrypted != block:
+            raise ValueError("Decrypted block does not match the original")
+
+    return {"encrypt_ms": summarize(encrypt_times), "decrypt_ms": summarize(decrypt_times)}
+
+
+def benchmark_files(rsa, sizes, generator):
+    """
+    Measures end-to-end encryption and decryption of files
+    :param rsa: Key to be used
+    :param sizes: File sizes in bytes
+    :param generator: Seeded random generator for the data
+    :return: Returns throughput in MB/s for each size
+    """
+    results = []
+
+    with tempfile.TemporaryDirectory() as folder:
+        input_path = os.path.join(folder, "input.bin")
+        encrypted_path = os.path.join(folder, "input.rsa")
+        decrypted_path = os.path.join(folder, "output.bin")
+
+        for size in sizes:
+            data = generator.randbytes(size)
+            with open(input_path, "wb") as file:
+                file.write(data)
+
+            start = time.perf_counter()
+            rsa.encrypt_data(input_path, encrypted_path)
+            encrypt_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            rsa.decrypt_data(encrypted_path, decrypted_path)
+            decrypt_time = time.perf_counter() - start
+
+            with open(decrypted_path, "rb") as file:
+                if file.read() != data:
+                    raise ValueError("Decrypted file does not match the original")
+
+            results.append({
+                "bytes": size,
+                "encrypted_bytes": os.path.getsize(encrypted_path),
+                "encrypt_mb_per_second": size / encrypt_time / 1e6,
+                "decrypt_mb_per_second": size / decrypt_time / 1e6,
+            })
+
+    return results
+
+
+if __name__ == "__main__":
+    arguments = fetch_arguments()
+
+    # RSAModule draws primes from the global generator, data comes from a separate seeded one
+    random.seed(arguments.seed)
+    generator = random.Random(arguments.seed)
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": arguments.seed,
+        "keys": arguments.keys,
+        "blocks": arguments.blocks,
+        "num_primes": {},
+    }
+
+    for num_primes in arguments.num_primes:
+        keygen, rsa = benchmark_keygen(num_primes, arguments.keys)
+        rsa.show_progress = False
+
+        results["num_primes"][str(num_primes)] = {
+            "keygen": keygen,
+            "blocks": benchmark_blocks(rsa, arguments.blocks, generator),
+            "files": benchmark_files(rsa, arguments.sizes, generator),
+        }
+
+    output = json.dumps(results, indent=2)
+
+    if arguments.output is None:
+        print(output)
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(output)
+        print(f"Results written to {arguments.output}", file=sys.stderr)
@@ -39,9 +39,9 @@ if __name__ == "__main__":
     filename = get_filename(file_path)
     filebase = remove_extension(filename)
     file_extension = get_extension(filename)
-    rsa = RSAModule()
 
     if mode == '-e':
+        rsa = RSAModule()
         rsa.encrypt_data(file_path, os.path.join(script_folder, filebase + "_" + file_extension + ".rsa"))
 
         rsa.export_public_key(os.path.join(script_folder, "pub_key.txt"))
@@ -62,6 +62,9 @@ if __name__ == "__main__":
             print(f"Private key file {private_key_path} not found. Please encrypt a file first.")
             sys.exit(1)
 
+        # Key is imported from the files, there is no need to generate a new one
+        rsa = RSAModule.from_components(None, None, None)
+
         #LOAD PUBLIC KEY
         try:
             rsa.import_public_key(public_key_path)
@@ -0,0 +1,182 @@
+import threading
+import unittest
+import tempfile
+import shutil
+import random
+import stat
+import sys
+import os
+
+sys.path.insert(0, "..")
+from RSAModule import RSAModule
+from RSADaemon import RSADaemon, RSADaemonClient
+from RSAKeyring import RSAKeyring
+
+
+class RSAModuleTester(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        random.seed(2025)
+        cls.rsa = RSAModule()
+        cls.rsa.show_progress = False
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def round_trip(self, rsa, data, decrypting_rsa=None):
+        """
+        Encrypts and decrypts the data through files
+        :return: Returns size of the encrypted file and the decrypted data
+        """
+        input_path = os.path.join(self.folder, "input.bin")
+        encrypted_path = os.path.join(self.folder, "encrypted.bin")
+        decrypted_path = os.path.join(self.folder, "decrypted.bin")
+
+        with open(input_path, "wb") as fw:
+            fw.write(data)
+
+        rsa.encrypt_data(input_path, encrypted_path)
+        (decrypting_rsa or rsa).decrypt_data(encrypted_path, decrypted_path)
+
+        with open(decrypted_path, "rb") as fr:
+            return os.path.getsize(encrypted_path), fr.read()
+
+    def test_partial_final_blocks(self):
+        """
+        This test encrypts data whose last block is empty, short, full and one byte over a full block
+        """
+        block_length = self.rsa.get_block_length()
+        data_length = block_length - self.rsa.padding_overhead
+
+        for length in (0, 1, 245, 246, data_length - 1, data_length, data_length + 1, 3 * data_length):
+            data = random.randbytes(length)
+            encrypted_size, decrypted = self.round_trip(self.rsa, data)
+
+            assert decrypted == data
+            assert encrypted_size == -(-length // data_length) * block_length
+
+    def test_tampered_block(self):
+        """
+        This test checks that a modified block fails with the same error wherever it was modified
+        """
+        block = self.rsa.encrypt_block(b"message")
+
+        for position in (0, 1, 100, len(block) - 1):
+            tampered = bytearray(block)
+            tampered[position] ^= 1
+
+            with self.assertRaises(ValueError) as context:
+                self.rsa.decrypt_block(bytes(tampered))
+            assert str(context.exception) == "Decryption error"
+
+    def test_multi_prime_crt_after_import(self):
+        """
+        This test exports and imports 3 and 4 prime keys and decrypts using CRT with all primes,
+        the result must match decryption without the factors
+        """
+        for num_primes in (3, 4):
+            rsa = RSAModule(num_primes=num_primes)
+            rsa.show_progress = False
+            assert rsa.n.bit_length() == rsa.output_length
+
+            public_key_path = os.path.join(self.folder, "pub_key.txt")
+            private_key_path = os.path.join(self.folder, "priv_key.txt")
+            rsa.export_public_key(public_key_path)
+            rsa.export_private_key(private_key_path)
+
+            imported = RSAModule.from_key_files(public_key_path, private_key_path)
+            imported.show_progress = False
+            assert imported.get_primes() == rsa.get_primes()
+            assert len(imported.other_primes) == num_primes - 2
+
+            data = random.randbytes(1000)
+            assert self.round_trip(rsa, data, imported)[1] == data
+
+            # Decryption without the factors uses pow(c, d, n)
+            plain = RSAModule.from_components(rsa.n, rsa.e, rsa.d)
+            plain.show_progress = False
+            assert self.round_trip(imported, data, plain)[1] == data
+
+    def test_daemon_round_trip(self):
+        """
+        This test decrypts data from several concurrent clients through the daemon on a temporary socket,
+        the socket must only be accessible by the owner and a file which is not a socket must not be replaced
+        """
+        socket_path = os.path.join(self.folder, "rsa.sock")
+        data_length = self.rsa.get_block_length() - self.rsa.padding_overhead
+        messages = [random.randbytes(data_length * (i % 3) + i + 1) for i in range(12)]
+        encrypted = [b"".join(self.rsa.encrypt_block(message[j:j + data_length])
+                              for j in range(0, len(message), data_length)) for message in messages]
+
+        daemon = RSADaemon(self.rsa, socket_path, max_batch_size=8, max_wait=0.01, workers=2)
+        daemon.start()
+        try:
+            assert stat.S_IMODE(os.stat(socket_path).st_mode) & 0o077 == 0
+
+            results = [None] * len(messages)
+
+            def decrypt(i):
+                with RSADaemonClient(socket_path) as client:
+                    results[i] = client.decrypt(encrypted[i])
+
+            threads = [threading.Thread(target=decrypt, args=(i,)) for i in range(len(messages))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert results == messages
+
+            with RSADaemonClient(socket_path) as client:
+                with self.assertRaises(ValueError):
+                    client.decrypt(bytes(self.rsa.get_block_length()))
+
+                stats = client.get_stats()
+                assert stats["requests"] == len(messages) + 1
+                assert stats["errors"] == 1
+        finally:
+            daemon.stop()
+
+        with open(socket_path, "w") as fw:
+            fw.write("not a socket")
+        with self.assertRaises(FileExistsError):
+            RSADaemon(self.rsa, socket_path, workers=1).start()
+        assert os.path.isfile(socket_path)
+
+    def test_keyring_round_trip(self):
+        """
+        This test writes keys to keyrings, opens them and looks the keys up,
+        a key of another keyring must not be found even when it is already cached
+        """
+        other_rsa = RSAModule(num_primes=3)
+        other_rsa.show_progress = False
+        first_path = os.path.join(self.folder, "first.ring")
+        second_path = os.path.join(self.folder, "second.ring")
+
+        RSAKeyring.export_keyring(first_path, [self.rsa])
+        RSAKeyring.export_keyring(second_path, [other_rsa])
+
+        first_id, other_id = RSAKeyring.get_key_id(self.rsa), RSAKeyring.get_key_id(other_rsa)
+
+        with RSAKeyring(first_path) as first, RSAKeyring(second_path) as second:
+            assert len(first) == 1 and first.get_key_ids() == [first_id]
+
+            key = first.get_key(first_id)
+            assert (key.n, key.e, key.d, key.get_primes()) == (self.rsa.n, self.rsa.e, self.rsa.d, self.rsa.get_primes())
+            assert first.get_key(first_id) is key
+
+            other_key = second.get_key(other_id)
+            assert other_key.get_primes() == other_rsa.get_primes()
+            assert other_key.other_primes == other_rsa.other_primes
+
+            assert other_id not in first
+            with self.assertRaises(KeyError):
+                first.get_key(other_id)
+
+            data = random.randbytes(500)
+            assert self.round_trip(other_rsa, data, other_key)[1] == data
+
@@ -1,17 +1,53 @@
 import constants
 import hashlib
-
+import tempfile
+import shutil
+import struct
+import math
+import lzma
+import zlib
+import bz2
+import mmap
+import os
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from PixelView import PixelView
+from PayloadReader import PayloadReader
 from io import SEEK_END
 
 class ImageFile:
 
-    def __init__(self, input_image, pass_phrase):
+    def __init__(self, input_image, pass_phrase, bits_per_channel=1, compression=None, compression_level=None):
         """
         Method initializes the ImageFile, checks
         format of the passed file and sets frequently used variables.
-        :param input_image: File to be used as a base for encoding/decoding
-        """
-        self.input_image = input_image
+        :param input_image: File to be used as a base for encoding/decoding, or a buffer holding the whole image
+                            (e.g. shared memory, used without copying)
+        :param bits_per_channel: Number of least significant bits of each colour byte used for the payload (1 - 4),
+                                 decoding reads the depth from the embedded header
+        :param compression: Method compressing the payload before it is embedded ("zlib", "lzma" or "bz2"),
+                            None to embed the payload as it is, decoding reads the method from the embedded header
+        :param compression_level: Level of the compression (0 - 9, 1 - 9 for bz2), None for the default level
+        """
+        if hasattr(input_image, "read"):
+            self.input_image, self.image_buffer = input_image, None
+        else:
+            self.input_image, self.image_buffer = None, input_image
+
+        if not 1 <= bits_per_channel <= constants.MAX_BITS_PER_CHANNEL:
+            raise ValueError(f"Bits per channel must be between 1 and {constants.MAX_BITS_PER_CHANNEL}")
+        self.bits_per_channel = bits_per_channel
+
+        if compression is not None and compression not in constants.COMPRESSION_METHODS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.compression, self.compression_level = compression, compression_level
+        if compression is not None:
+            self.__create_compressor()
 
         if not self.__check_format():
             raise ValueError("Invalid image format")
@@ -19,251 +55,552 @@ class ImageFile:
         self.data_offset = self.__get_data_offset()
         self.width, self.height = self.__get_dimensions()
         self.padding = self.__get_padding()
+        if self.image_buffer is None:
+            self.pixels = PixelView.from_file(self.input_image, self.data_offset, self.width, self.height, self.padding)
+        else:
+            self.pixels = PixelView(self.image_buffer, self.data_offset, self.width, self.height, self.padding)
+        self.height = self.pixels.height
         self.capacity = self.__get_image_capacity()
         self.hash = self.__get_hash(pass_phrase)
+        self.payload_header = None
 
-    def encode_file(self, input_file, output_filename):
+    def close(self):
         """
-        Encodes file with the given name to the image file
+        Method releases the pixel view (unmaps the input image)
+        """
+        self.pixels.close()
+
+    def encode_file(self, input_file, output_filename, in_place=False, chunk_size=constants.CHUNK_SIZE, shard=None):
+        """
+        Encodes file with the given name to the image file.
+        The carrier is copied to the output and the payload is embedded in windows of chunk_size bytes
+        through a memory map of the output, so memory use does not depend on the size of the payload or the carrier.
         :param input_file: Input file to be encoded
         :param output_filename: Output file to be written to
-        """
+        :param in_place: True to clone the carrier using an OS-level copy (reflink or copy_file_range)
+                         instead of a buffered copy (the output is the same)
+        :param chunk_size: Number of payload bytes processed at once
+        :param shard: Dictionary describing a part of the input file encoded as one shard of a multi-carrier payload
+                      (index, total, offset, length, total_size, digest), None to encode the whole file
+        With compression enabled the contents are first compressed to a temporary file and the compressed bytes
+        are embedded, the capacity is checked against the compressed size.
+        """
+        contents_offset, file_size = (0, self.__get_file_size(input_file)) if shard is None else (shard["offset"], shard["length"])
+        source, compression = input_file, None
+
+        # Compressed contents are embedded instead of the file, so their size is known before the capacity check
+        if self.compression is not None:
+            source = self.__compress_contents(input_file, contents_offset, file_size)
+            compression = constants.COMPRESSION_METHODS[self.compression], file_size
+            contents_offset, file_size = 0, self.__get_file_size(source)
 
+        try:
+            self.__embed_contents(source, contents_offset, file_size, output_filename, in_place,
+                                  self.__create_header(file_size, self.__get_file_extension_bytes(input_file), shard, compression),
+                                  chunk_size)
+        finally:
+            if source is not input_file:
+                source.close()
 
-        file_size = self.__get_file_size(input_file)
+    def decode_file(self, output_filename, chunk_size=constants.CHUNK_SIZE):
+        """
+        Method decodes the file from the image, the contents are decoded and written in windows of chunk_size bytes
+        :param output_filename: Name of a file where the decoded file will be written
+        :param chunk_size: Number of payload bytes processed at once
+        """
 
-        if self.capacity < (file_size + constants.INTEGER_SIZE + constants.EXTENSION_SIZE):
-            raise ValueError(f"File is too large to be encoded.")
+        header = self.read_header()
 
-        current_width, current_height = 0, 0
+        if header["shard"] is not None:
+            raise ValueError("Image contains one shard of a multi-carrier payload.")
 
+        output_path = output_filename + "." + header["extension"]
         try:
-            output_image = open(output_filename, "wb")
+            output_file = open(output_path, "wb")
         except Exception as e:
             raise ValueError(f"Failed opening file: {e}")
 
+        # A partially decoded file is removed if decoding fails
+        try:
+            with output_file:
+                self.__decode_contents(header, output_file, chunk_size)
+        except BaseException:
+            os.remove(output_path)
+            raise
 
-
-        self.__copy_image_metadata(output_image)
-        current_width, current_height = self.__write_file_size(file_size, output_image, current_width, current_height)
-        current_width, current_height = self.__write_extension(input_file, output_image, current_width, current_height)
-        current_width, current_height = self.__write_contents(input_file, file_size, output_image, current_width, current_height)
-        self.__copy_rest_of_image(output_image, current_width, current_height)
-        output_image.close()
-
-    def decode_file(self, output_filename):
+    def decode_shard(self, output_file, chunk_size=constants.CHUNK_SIZE):
         """
-        Method decodes the file from the image
-        :param output_filename: Name of a file where the decoded file will be written
+        Method decodes the shard of a multi-carrier payload stored in the image
+        and writes it to its position in the output file
+        :param output_file: Output file opened for writing (other shards may be written by other processes)
+        :param chunk_size: Number of payload bytes processed at once
+        :return: Returns the header of the image
         """
+        header = self.read_header()
+
+        if header["shard"] is None:
+            raise ValueError("Image does not contain a shard of a multi-carrier payload.")
 
-        current_width, current_height = 0, 0
+        output_file.seek(header["shard"]["offset"])
+        self.__decode_contents(header, output_file, chunk_size)
+        output_file.flush()
+        return header
 
+    def read_header(self):
+        """
+        Method reads the embedded header
+        :return: Returns dictionary with size of the contents, file extension, bits per channel,
+                 header length in bytes, shard description (None if the image is not a shard)
+                 and compression description (None if the contents are not compressed)
+        """
         # If the input image is too small to fit metadata
         if self.capacity < (constants.INTEGER_SIZE + constants.EXTENSION_SIZE):
             raise ValueError("File size is too small to contain any data.")
 
-        file_size, current_width, current_height = self.__fetch_file_size(current_width, current_height)
+        header_length = constants.INTEGER_SIZE + constants.EXTENSION_SIZE
+        data = self.__extract_bytes(0, header_length, 1)
+        header = {
+            "size": int.from_bytes(data[:constants.INTEGER_SIZE], "little"),
+            "extension": "",
+            "bits_per_channel": 1,
+            "length": header_length,
+            "shard": None,
+            "compression": None,
+        }
+        options = data[constants.INTEGER_SIZE:]
+
+        if options[0] != constants.HEADER_MARKER:
+            header["extension"] = self.__decode_extension(options)
+            return self.__check_header(header)
+
+        bits_per_channel, flags = options[2], options[3]
+        if options[1] != constants.HEADER_VERSION or not 1 <= bits_per_channel <= constants.MAX_BITS_PER_CHANNEL:
+            raise ValueError("Unsupported header of the encoded file.")
+        header["bits_per_channel"] = bits_per_channel
+
+        # The real extension (and the shard and compression descriptions) follows the extended header
+        sections_length = constants.EXTENSION_SIZE
+        if flags & constants.FLAG_SHARD:
+            sections_length += struct.calcsize(constants.SHARD_FORMAT)
+        if flags & constants.FLAG_COMPRESSED:
+            sections_length += struct.calcsize(constants.COMPRESSION_FORMAT)
+
+        if self.pixels.length < (header_length + sections_length) * constants.BITS_IN_BYTE:
+            raise ValueError("File size is too small to contain any data.")
 
-        # If the file is too large
-        if self.capacity < (file_size + constants.INTEGER_SIZE + constants.EXTENSION_SIZE):
-            raise ValueError("File size to fetch loaded file size.")
+        sections = self.__extract_bytes(header_length * constants.BITS_IN_BYTE, sections_length, 1)
+        header["extension"] = self.__decode_extension(sections[:constants.EXTENSION_SIZE])
+        header["length"] = header_length + sections_length
 
-        file_extension, current_width, current_height = self.__fetch_file_extension(current_width, current_height)
-        file_contents, current_width, current_height = self.__fetch_file_content(file_size, current_width, current_height)
+        if flags & constants.FLAG_SHARD:
+            index, total, offset, total_size, digest = struct.unpack_from(constants.SHARD_FORMAT, sections, constants.EXTENSION_SIZE)
+            header["shard"] = {"index": index, "total": total, "offset": offset, "total_size": total_size, "digest": digest}
 
-        try:
-            output_file = open(output_filename + "." + file_extension, "wb")
-        except Exception as e:
-            raise ValueError(f"Failed opening file: {e}")
+        if flags & constants.FLAG_COMPRESSED:
+            method, size = struct.unpack_from(constants.COMPRESSION_FORMAT, sections, sections_length - struct.calcsize(constants.COMPRESSION_FORMAT))
+            methods = {value: name for name, value in constants.COMPRESSION_METHODS.items()}
+            if method not in methods:
+                raise ValueError("Unsupported compression of the encoded file.")
+            header["compression"] = {"method": methods[method], "size": size}
 
-        output_file.write(file_contents)
-        output_file.close()
+        return self.__check_header(header)
 
-    def __write_contents(self, file, file_size, output_image, current_width, current_height):
+    def read_range(self, offset, length):
         """
-        Method encodes the contents of the file to the output image
-        :param file: Source to be encoded
-        :param file_size: Size of the source file (or size to be encoded)
-        :param output_image: File to write the encoded data to
-        :param current_width: Current width position
-        :param current_height: Current height position
-        :return: Returns the current width and height positions
+        Method decodes a range of the embedded payload without decoding the rest of it.
+        Payload byte i is stored at a fixed position after the header and encrypted with byte i mod 64 of the hash,
+        so only the carrier bytes holding the range are read.
+        :param offset: Offset in the payload (in the shard for images containing a shard)
+        :param length: Number of bytes, the range is cut at the end of the payload
+        :return: Returns the decoded bytes
         """
+        header = self.__get_payload_header()
 
-        file.seek(0)
-        self.__seek_file(current_width, current_height)
-        self.__seek_file(current_width, current_height, output_image)
-
-        hash_index = 0
-
-        while file.tell() < file_size:
-            byte = file.read(1)[0]
-
-            byte ^= self.hash[hash_index]
-            hash_index = (hash_index + 1) % len(self.hash)
-
-            bit_index = 7
+        if offset < 0 or length < 0:
+            raise ValueError("Range is outside of the payload.")
 
-            while bit_index >= 0:
-                bit = (byte >> bit_index) & 1
-                self.__write_bit(bit, output_image)
+        length = max(0, min(length, header["size"] - offset))
+        if length == 0:
+            return b""
 
-                bit_index -= 1
-                current_width += 1
+        # With 3 bits per channel only every third payload byte starts at the beginning of a carrier byte
+        bits_per_channel = header["bits_per_channel"]
+        start = offset - offset % (bits_per_channel // math.gcd(constants.BITS_IN_BYTE, bits_per_channel))
+        carrier_start = header["length"] * constants.BITS_IN_BYTE + self.__get_carrier_length(0, start, bits_per_channel)
 
-                if current_width >= self.width:
-                    current_width = 0
-                    current_height += 1
+        contents = np.frombuffer(self.__extract_bytes(carrier_start, offset + length - start, bits_per_channel), dtype=np.uint8)
+        keystream = np.frombuffer(self.hash, dtype=np.uint8)[np.arange(start, offset + length) % len(self.hash)]
+        return (contents ^ keystream)[offset - start:].tobytes()
 
-                    if current_height >= self.height:
-                        break
-
-                    self.__seek_file(current_width, current_height)
-                    self.__seek_file(current_width, current_height, output_image)
-
-
-        return current_width, current_height
-
-    def __write_file_size(self, file_size, output_image, width_position, height_position):
+    def open_payload(self):
         """
-        Method writes the size of the file to the output image as 4 byte unsigned integer, little endian format
-        :param file_size: File size to be written
-        :param output_image: File to write the size to
-        :param width_position: Current width position
-        :param height_position: Current height position
-        :return: Returns the current width and height positions after encoding the size
+        Method opens the embedded payload as a read only file-like object with seek and read,
+        which decodes only the ranges that are read
+        :return: Returns PayloadReader of the payload
         """
+        return PayloadReader(self, self.__get_payload_header()["size"])
 
-        self.__seek_file(width_position, height_position)
-        self.__seek_file(width_position, height_position, output_image)
-
-        size_bytes = file_size.to_bytes(constants.INTEGER_SIZE, "little")
-
-        for size_byte in size_bytes:
-            bit_index = 7
+    def get_payload_capacity(self, sharded=False):
+        """
+        Method calculates how many bytes of a file fit into the image (bytes after compression if it is enabled)
+        :param sharded: True for the capacity of a shard of a multi-carrier payload (larger header)
+        :return: Returns the capacity in bytes
+        """
+        compression = None if self.compression is None else (constants.COMPRESSION_METHODS[self.compression], 0)
+        header_length = len(self.__create_header(0, bytes(constants.EXTENSION_SIZE), {} if sharded else None, compression))
+        free_carrier = self.pixels.length - header_length * constants.BITS_IN_BYTE
+        return max(0, free_carrier * self.bits_per_channel // constants.BITS_IN_BYTE)
 
-            while bit_index >= 0:
-                bit = (size_byte >> bit_index) & 1
-                self.__write_bit(bit, output_image)
+    def __get_payload_header(self):
+        """
+        Method reads the header once for reading ranges of the payload
+        :return: Returns the header
+        """
+        if self.payload_header is None:
+            header = self.read_header()
+            if header["compression"] is not None:
+                raise ValueError("Compressed payload can not be read by ranges.")
+            self.payload_header = header
+        return self.payload_header
 
-                bit_index -= 1
-                width_position += 1
+    def __check_header(self, header):
+        """
+        Method checks that the contents described by the header fit into the image
+        :param header: Header read from the image
+        :return: Returns the header
+        """
+        # If the file is too large
+        if self.__get_carrier_length(header["length"], header["size"], header["bits_per_channel"]) > self.pixels.length:
+            raise ValueError("File size to fetch loaded file size.")
+        return header
 
-                if width_position >= self.width:
-                    width_position = 0
-                    height_position += 1
+    def __embed_contents(self, source, contents_offset, file_size, output_filename, in_place, header, chunk_size):
+        """
+        Method copies the carrier to the output and embeds the header and the contents,
+        a partially written output is removed if encoding fails
+        :param source: File with the contents
+        :param contents_offset: Offset of the contents in the file
+        :param file_size: Size of the contents
+        :param output_filename: Output file to be written to
+        :param in_place: True to clone the carrier using an OS-level copy
+        :param header: Header bytes
+        :param chunk_size: Number of payload bytes processed at once
+        """
+        if self.__get_carrier_length(len(header), file_size, self.bits_per_channel) > self.pixels.length:
+            raise ValueError(f"File is too large to be encoded.")
 
-                    if height_position >= self.height:
-                        break
+        try:
+            output_image = open(output_filename, "w+b")
+        except Exception as e:
+            raise ValueError(f"Failed opening file: {e}")
 
-                    self.__seek_file(width_position, height_position)
-                    self.__seek_file(width_position, height_position, output_image)
+        try:
+            with output_image:
+                if in_place:
+                    self.__clone_image(output_image)
+                else:
+                    self.__copy_image(output_image)
+
+                output_pixels = PixelView(mmap.mmap(output_image.fileno(), 0), self.data_offset, self.width, self.height, self.padding)
+                try:
+                    self.__embed_windows(output_pixels, source, contents_offset, file_size, header, chunk_size)
+                    output_pixels.buffer.flush()
+                finally:
+                    # Closing the view unmaps the file
+                    output_pixels.close()
+        except BaseException:
+            os.remove(output_filename)
+            raise
+
+    def __embed_windows(self, output_pixels, source, contents_offset, file_size, header, chunk_size):
+        """
+        Method embeds the header and the contents window by window through the view of the output
+        :param output_pixels: PixelView of the output image
+        :param source: File with the contents
+        :param contents_offset: Offset of the contents in the file
+        :param file_size: Size of the contents
+        :param header: Header bytes
+        :param chunk_size: Number of payload bytes processed at once
+        """
+        # Header is always stored in one bit per carrier byte, contents use the selected depth
+        header_length = len(header) * constants.BITS_IN_BYTE
+        output_pixels.put_range(0, self.__embed_bits(self.pixels.get_range(0, header_length), np.frombuffer(header, dtype=np.uint8), 1))
+
+        source.seek(contents_offset)
+        chunk_size = self.__get_window_size(chunk_size, self.bits_per_channel)
+        keystream = np.resize(np.frombuffer(self.hash, dtype=np.uint8), chunk_size)
+        carrier_start = header_length
+
+        for offset in range(0, file_size, chunk_size):
+            contents = np.frombuffer(source.read(min(chunk_size, file_size - offset)), dtype=np.uint8)
+            contents = contents ^ keystream[:len(contents)]
+
+            # N payload bytes occupy 8N/k carrier bytes
+            carrier_length = self.__get_carrier_length(0, len(contents), self.bits_per_channel)
+            carrier = self.pixels.get_range(carrier_start, carrier_length)
+            output_pixels.put_range(carrier_start, self.__embed_bits(carrier, contents, self.bits_per_channel))
+
+            self.pixels.release(carrier_start, carrier_length)
+            output_pixels.release(carrier_start, carrier_length)
+            carrier_start += carrier_length
+
+    def __decode_contents(self, header, output_file, chunk_size):
+        """
+        Method decodes the contents described by the header and writes them to the output file window by window
+        :param header: Header read from the image
+        :param output_file: Output file positioned where the contents start
+        :param chunk_size: Number of payload bytes processed at once
+        """
+        file_size, bits_per_channel = header["size"], header["bits_per_channel"]
+        chunk_size = self.__get_window_size(chunk_size, bits_per_channel)
+        keystream = np.resize(np.frombuffer(self.hash, dtype=np.uint8), chunk_size)
+        carrier_start = header["length"] * constants.BITS_IN_BYTE
+
+        compression = header["compression"]
+        decompressor = None if compression is None else self.__create_decompressor(compression["method"])
+        decompressed_size = 0
+
+        for offset in range(0, file_size, chunk_size):
+            length = min(chunk_size, file_size - offset)
+            contents = np.frombuffer(self.__extract_bytes(carrier_start, length, bits_per_channel), dtype=np.uint8)
+            contents = (contents ^ keystream[:length]).tobytes()
+
+            if decompressor is None:
+                output_file.write(contents)
+            else:
+                for piece in self.__decompress_window(decompressor, contents):
+                    decompressed_size += len(piece)
+                    if decompressed_size > compression["size"]:
+                        raise ValueError("Decompressed size does not match the size of the encoded file.")
+                    output_file.write(piece)
+
+            carrier_length = self.__get_carrier_length(0, length, bits_per_channel)
+            self.pixels.release(carrier_start, carrier_length)
+            carrier_start += carrier_length
+
+        if decompressor is not None and (not decompressor.eof or decompressed_size != compression["size"]):
+            raise ValueError("Decompressed size does not match the size of the encoded file.")
+
+    def __compress_contents(self, input_file, contents_offset, file_size):
+        """
+        Method compresses the contents of the input file to a temporary file, buffer by buffer
+        :param input_file: Input file
+        :param contents_offset: Offset of the contents in the input file
+        :param file_size: Size of the contents
+        :return: Returns the temporary file with the compressed contents (removed when closed)
+        """
+        compressor = self.__create_compressor()
+        compressed = tempfile.TemporaryFile()
+        input_file.seek(contents_offset)
 
-        return width_position, height_position
+        for offset in range(0, file_size, constants.BUFFER_SIZE):
+            compressed.write(compressor.compress(input_file.read(min(constants.BUFFER_SIZE, file_size - offset))))
+        compressed.write(compressor.flush())
+        return compressed
 
-    def __write_extension(self, input_file, output_image, current_width, current_height):
+    def __create_compressor(self):
         """
-        Method writes the extension of the file to the output image
-        :param input_file: Input file
+        Method creates the compressor of the selected method and level
+        :return: Returns the compressor object
+        """
+        try:
+            if self.compression == "zlib":
+                return zlib.compressobj(-1 if self.compression_level is None else self.compression_level)
+            if self.compression == "lzma":
+                return lzma.LZMACompressor(preset=self.compression_level)
+            return bz2.BZ2Compressor(9 if self.compression_level is None else self.compression_level)
+        except (ValueError, TypeError, lzma.LZMAError, zlib.error) as e:
+            raise ValueError(f"Invalid compression level: {e}")
+
+    def __decompress_window(self, decompressor, contents):
+        """
+        Method decompresses one window of the contents in pieces of at most BUFFER_SIZE bytes,
+        so memory use does not depend on the compression ratio
+        :param decompressor: Decompressor of the contents
+        :param contents: Decoded window of the compressed contents
+        :return: Yields the decompressed pieces
+        """
+        try:
+            piece = decompressor.decompress(contents, constants.BUFFER_SIZE)
+            while True:
+                yield piece
+
+                # zlib keeps the input it did not process, lzma and bz2 keep it internally
+                if hasattr(decompressor, "unconsumed_tail"):
+                    if not decompressor.unconsumed_tail and len(piece) < constants.BUFFER_SIZE:
+                        return
+                    piece = decompressor.decompress(decompressor.unconsumed_tail, constants.BUFFER_SIZE)
+                else:
+                    if decompressor.eof or decompressor.needs_input:
+                        return
+                    piece = decompressor.decompress(b"", constants.BUFFER_SIZE)
+        except (zlib.error, lzma.LZMAError, OSError, EOFError) as e:
+            raise ValueError(f"Failed decompressing the decoded file: {e}")
+
+    def __create_decompressor(self, method):
+        """
+        Method creates the decompressor of the given method
+        :param method: Name of the compression method
+        :return: Returns the decompressor object
+        """
+        if method == "zlib":
+            return zlib.decompressobj()
+        if method == "lzma":
+            return lzma.LZMADecompressor()
+        return bz2.BZ2Decompressor()
+
+    def __get_window_size(self, chunk_size, bits_per_channel):
+        """
+        Method aligns the window size, so that every window starts at the beginning of the passphrase hash
+        and fills a whole number of carrier bytes
+        :param chunk_size: Requested number of payload bytes in a window
+        :param bits_per_channel: Number of bits stored in each carrier byte
+        :return: Returns the aligned window size
+        """
+        alignment = len(self.hash) * bits_per_channel // math.gcd(len(self.hash), bits_per_channel)
+        return max(alignment, chunk_size // alignment * alignment)
+
+    def __copy_image(self, output_image):
+        """
+        Method copies the input image to the output image using a buffered copy
         :param output_image: Output file
-        :param current_width: Current width position
-        :param current_height: Current height position
         """
+        output_image.seek(0)
+        output_image.truncate(0)
 
-        self.__seek_file(current_width, current_height)
-        self.__seek_file(current_width, current_height, output_image)
+        if self.image_buffer is None:
+            self.input_image.seek(0)
+            shutil.copyfileobj(self.input_image, output_image, constants.BUFFER_SIZE)
+        else:
+            with memoryview(self.image_buffer) as image_data:
+                for start in range(0, len(image_data), constants.BUFFER_SIZE):
+                    output_image.write(image_data[start:start + constants.BUFFER_SIZE])
 
-        extension_bytes = self.__get_file_extension_bytes(input_file)
+        output_image.flush()
 
-        for extension_byte in extension_bytes:
-            bit_index = 7
-
-            while bit_index >= 0:
-                bit = (extension_byte >> bit_index) & 1
-                self.__write_bit(bit, output_image)
+    def __clone_image(self, output_image):
+        """
+        Method copies the input image to the output image using the fastest available way -
+        reflink (shared blocks on copy-on-write file systems), copy_file_range inside the kernel,
+        or a buffered copy as the last resort
+        :param output_image: Output file
+        """
+        if self.image_buffer is not None:
+            self.__copy_image(output_image)
+            return
 
-                bit_index -= 1
-                current_width += 1
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(output_image.fileno(), constants.FICLONE, self.input_image.fileno())
+                return
+            except (OSError, ValueError):
+                pass
 
-                if current_width >= self.width:
-                    current_width = 0
-                    current_height += 1
+        size = self.__get_file_size(self.input_image)
+        output_image.truncate(0)
 
-                    if current_height >= self.height:
-                        break
+        try:
+            copied = 0
+            while copied < size:
+                length = os.copy_file_range(self.input_image.fileno(), output_image.fileno(), size - copied, copied, copied)
+                if length == 0:
+                    break
+                copied += length
+            if copied == size:
+                return
+        except (OSError, AttributeError, ValueError):
+            pass
+
+        self.__copy_image(output_image)
+
+    def __create_header(self, file_size, extension_bytes, shard=None, compression=None):
+        """
+        Method creates the embedded header. With one bit per channel the original header
+        (size, extension) is used, otherwise the extension field starts with a marker
+        and holds version, depth and flags, followed by the real extension, the shard description
+        and the compression description.
+        :param file_size: Size of the encoded contents
+        :param extension_bytes: Extension of the encoded file
+        :param shard: Shard description (None if the whole file is encoded)
+        :param compression: Tuple (method, size before compression), None if the contents are not compressed
+        :return: Returns the header bytes
+        """
+        size_bytes = file_size.to_bytes(constants.INTEGER_SIZE, "little")
 
-                    self.__seek_file(current_width, current_height)
-                    self.__seek_file(current_width, current_height, output_image)
+        if self.bits_per_channel == 1 and shard is None and compression is None:
+            return size_bytes + extension_bytes
 
-        return current_width, current_height
+        flags = (0 if shard is None else constants.FLAG_SHARD) | (0 if compression is None else constants.FLAG_COMPRESSED)
+        options = bytes([constants.HEADER_MARKER, constants.HEADER_VERSION, self.bits_per_channel, flags])
+        header = size_bytes + options + extension_bytes
 
+        if shard is not None:
+            header += struct.pack(constants.SHARD_FORMAT, shard.get("index", 0), shard.get("total", 0), shard.get("offset", 0),
+                                  shard.get("total_size", 0), shard.get("digest", b""))
+        if compression is not None:
+            header += struct.pack(constants.COMPRESSION_FORMAT, *compression)
+        return header
 
-    def __copy_image_metadata(self, output_image):
+    def __get_carrier_length(self, header_length, file_size, bits_per_channel):
         """
-        Method copies metadata from the input image to the output image
-        :param output_image: File to write metadata to
+        Method calculates number of carrier bytes needed for the header and the file contents
+        :param header_length: Length of the header in bytes (stored in one bit per carrier byte)
+        :param file_size: Size of the file contents in bytes
+        :param bits_per_channel: Depth used for the file contents
+        :return: Returns number of carrier bytes
         """
-        self.__copy_image_data(output_image, 0, self.data_offset)
+        return header_length * constants.BITS_IN_BYTE + -(-file_size * constants.BITS_IN_BYTE // bits_per_channel)
 
-    def __copy_rest_of_image(self, output_image, current_width, current_height):
+    def __embed_bits(self, carrier, data, bits_per_channel):
         """
-        Method copies data from current position all the way to the end of the image
-        :param output_image: File to write data to
-        :param current_width: Current width position
-        :param current_height: Current height position
+        Method replaces the lowest bits of carrier bytes with bits of the data (most significant first)
+        :param carrier: uint8 array of carrier bytes
+        :param data: uint8 array of data
+        :param bits_per_channel: Number of bits stored in each carrier byte
+        :return: Returns the modified carrier bytes
         """
-        start = self.data_offset + current_height * (self.width + self.padding) + current_width
-        end = self.data_offset + self.height * (self.width + self.padding)
-        self.__copy_image_data(output_image, start, end)
+        bits = np.unpackbits(data)
+        bits = np.concatenate((bits, np.zeros(len(carrier) * bits_per_channel - len(bits), dtype=np.uint8)))
+
+        # Groups of k bits combined into values 0 .. 2^k - 1
+        weights = (1 << np.arange(bits_per_channel - 1, -1, -1)).astype(np.uint8)
+        values = bits.reshape(-1, bits_per_channel) @ weights
 
-    def __copy_image_data(self, output_image, start, end):
+        mask = (1 << bits_per_channel) - 1
+        return (carrier & (0xFF ^ mask)) | values.astype(np.uint8)
+
+    def __extract_bytes(self, start, length, bits_per_channel):
         """
-        Method copies data from the input image to the output image
-        :param output_image: file to write data to
-        :param start: start position in the input image
-        :param end: end position in the input image
+        Method extracts bytes hidden in the lowest bits of the carrier,
+        only the pixel rows containing the requested bytes are touched
+        :param start: Index of the first carrier byte (from the start of the pixel array)
+        :param length: Number of bytes to be extracted
+        :param bits_per_channel: Number of bits stored in each carrier byte
+        :return: Returns the extracted bytes
         """
-        self.input_image.seek(start)
-        output_image.seek(start)
-
-        remaining = end - start
-        while remaining > 0:
-            to_read = min(constants.BUFFER_SIZE, remaining)
-            data = self.input_image.read(to_read)
+        if length == 0:
+            return b""
 
-            if not data:
-                break
+        carrier = self.pixels.get_range(start, self.__get_carrier_length(0, length, bits_per_channel))
 
-            output_image.write(data)
-            remaining -= len(data)
+        # With one bit per channel every carrier byte holds one bit, so the bits are packed directly
+        if bits_per_channel == 1:
+            return np.packbits(carrier & 1).tobytes()
 
-    def __seek_file(self, width_position, height_position, file=None):
-        """"
-        Method seeks to the position in the image file
-        :param width_position: Width position
-        :param height_position: Height position
-        :param file: File to seek in
-        """
-        if file is None:
-            file = self.input_image
+        values = carrier & ((1 << bits_per_channel) - 1)
 
-        seek_pos = self.data_offset + height_position * (self.width + self.padding) + width_position
-        file.seek(seek_pos)
+        # The lowest k bits of every carrier byte, most significant first
+        bits = np.unpackbits(values[:, np.newaxis], axis=1)[:, constants.BITS_IN_BYTE - bits_per_channel:]
+        return np.packbits(bits.reshape(-1)[:length * constants.BITS_IN_BYTE]).tobytes()
 
-    def __write_bit(self, bit: int, file):
+    def __decode_extension(self, extension_bytes):
         """
-        Writes a single bit to a file
-        :param bit: Bit to be written
-        :param file: File to write the bit to
+        Method converts the stored extension to a string, unprintable characters (zero padding) are removed
+        :param extension_bytes: Extension bytes read from the image
+        :return: Returns the file extension
         """
-        byte = self.input_image.read(1)[0]
-        byte = (byte & 0xFE) | (bit & 1)
-        file.write(bytes([byte]))
-
-    def __read_bit(self):
-        byte = self.input_image.read(1)[0]
-        return byte & 1
+        raw_string = extension_bytes.decode('utf-8', errors='replace')
+        return ''.join(char for char in raw_string if char.isprintable())
 
     def __check_format(self):
         """
@@ -271,12 +608,11 @@ class ImageFile:
         :return: Returns True if the file has correct format, False otherwise
         """
 
-        size = self.__get_file_size(self.input_image)
+        size = self.__get_file_size(self.input_image) if self.image_buffer is None else len(memoryview(self.image_buffer))
         if size < (constants.SIZE_OFFSET + constants.INTEGER_SIZE):
             return False
 
-        self.input_image.seek(constants.SIZE_OFFSET)
-        declared_size = int.from_bytes(self.input_image.read(constants.INTEGER_SIZE), "little")
+        declared_size = int.from_bytes(self.__read_image_bytes(constants.SIZE_OFFSET, constants.INTEGER_SIZE), "little")
 
         return size == declared_size
 
@@ -285,7 +621,7 @@ class ImageFile:
         Method calculates the padding in each row of the image
         :return: Returns number of bytes of padding for each row
         """
-        return (constants.PADDING_MULTIPLE - ((self.width * constants.BYTES_PER_PIXEL) % constants.PADDING_MULTIPLE)) % constants.PADDING_MULTIPLE
+        return (constants.PADDING_MULTIPLE - (self.width % constants.PADDING_MULTIPLE)) % constants.PADDING_MULTIPLE
 
     def __get_hash(self, pass_phrase):
         """
@@ -330,7 +666,7 @@ class ImageFile:
         Method calculates the image's capacity in bytes (space for encoding additional data).
         :return: image capacity in bytes
         """
-        return self.width * self.height / constants.BITS_IN_BYTE
+        return self.width * self.height * self.bits_per_channel / constants.BITS_IN_BYTE
 
     def __get_data_offset(self):
         """
@@ -338,132 +674,29 @@ class ImageFile:
         in the file from image header
         :return: Returns the offset in bytes
         """
-        self.input_image.seek(constants.DATA_OFFSET)
-        return int.from_bytes(self.input_image.read(constants.INTEGER_SIZE), "little")
+        return int.from_bytes(self.__read_image_bytes(constants.DATA_OFFSET, constants.INTEGER_SIZE), "little")
 
     def __get_dimensions(self):
         """
         Method fetches the image's dimensions
         from the image header
-        :return: Returns width and height of the image
+        :return: Returns width of a row in bytes and height of the image (negative for top-down BMPs)
         """
-        self.input_image.seek(constants.DIMENSIONS_OFFSET)
-        width = int.from_bytes(self.input_image.read(constants.INTEGER_SIZE), "little")
-        height = int.from_bytes(self.input_image.read(constants.INTEGER_SIZE), "little")
+        dimensions = self.__read_image_bytes(constants.DIMENSIONS_OFFSET, 2 * constants.INTEGER_SIZE)
+        width = int.from_bytes(dimensions[:constants.INTEGER_SIZE], "little")
+        height = int.from_bytes(dimensions[constants.INTEGER_SIZE:], "little", signed=True)
         return width * constants.BYTES_PER_PIXEL, height
 
-    def __fetch_file_size(self, current_width, current_height):
+    def __read_image_bytes(self, offset, length):
         """
-        Method fetches the size of the file from the image bytes at given position
-        :param current_width: Current width position
-        :param current_height: Current height position
-        :return: Returns file_size, current_width, current_height (position after fetching the size)
+        Method reads bytes of the input image header
+        :param offset: Offset in the image
+        :param length: Number of bytes
+        :return: Returns the bytes
         """
-        self.__seek_file(current_width, current_height)
-
-        file_size_bytes = []
-
-        for i in range(constants.INTEGER_SIZE):
-
-            bit_index = constants.BITS_IN_BYTE - 1
-            current_byte = 0
-
-            while bit_index >= 0:
-
-                current_byte |= self.__read_bit() << bit_index
-
-                bit_index -= 1
-                current_width += 1
-
-                if current_width >= self.width:
-                    current_width = 0
-                    current_height += 1
-
-                    if current_height >= self.height:
-                        break
-
-                    self.__seek_file(current_width, current_height)
-
-            file_size_bytes.append(current_byte)
-
-        file_size = int.from_bytes(file_size_bytes, "little")
-        return file_size, current_width, current_height
-
-    def __fetch_file_extension(self, current_width, current_height):
-        """
-        Method fetches file extension at current position
-        :param current_width: Current width position
-        :param current_height: Current height position
-        :return: Returns file extension, current_width, current_height (position after fetching the extension)
-        """
-        self.__seek_file(current_width, current_height)
-
-        file_extension_bytes = []
-
-        for i in range(constants.INTEGER_SIZE):
-
-            bit_index = constants.BITS_IN_BYTE - 1
-            current_byte = 0
-
-            while bit_index >= 0:
-
-                current_byte |= self.__read_bit() << bit_index
-
-                bit_index -= 1
-                current_width += 1
-
-                if current_width >= self.width:
-                    current_width = 0
-                    current_height += 1
-
-                    if current_height >= self.height:
-                        break
-
-                    self.__seek_file(current_width, current_height)
-
-            file_extension_bytes.append(current_byte)
-
-        raw_string = bytes(file_extension_bytes).decode('utf-8', errors='replace')
-        extension = ''.join(char for char in raw_string if char.isprintable())
-        return extension, current_width, current_height
-
-    def __fetch_file_content(self, file_size, current_width, current_height):
-        """
-        Method fetches the content of a file from the image
-        :param file_size: Size of the file to be fetched
-        :param current_width: Current width position
-        :param current_height: Current height position
-        :return: Returns bytes (content), current_width, current_height (position after fetching the content)
-        """
-        self.__seek_file(current_width, current_height)
-
-        content_bytes = []
-        hash_index = 0
-
-        for i in range(file_size):
-
-            bit_index = constants.BITS_IN_BYTE - 1
-            current_byte = 0
-
-            while bit_index >= 0:
-
-                current_byte |= self.__read_bit() << bit_index
-
-                bit_index -= 1
-                current_width += 1
-
-                if current_width >= self.width:
-                    current_width = 0
-                    current_height += 1
-
-                    if current_height >= self.height:
-                        break
-
-                    self.__seek_file(current_width, current_height)
-
-            current_byte ^= self.hash[hash_index]
-            hash_index = (hash_index + 1) % len(self.hash)
-
-            content_bytes.append(current_byte)
+        if self.image_buffer is not None:
+            with memoryview(self.image_buffer) as image_data:
+                return bytes(image_data[offset:offset + length])
 
-        return bytes(content_bytes), current_width, current_height
\ No newline at end of file
+        self.input_image.seek(offset)
+        return self.input_image.read(length)
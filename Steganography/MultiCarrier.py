@@ -0,0 +1,188 @@
+import hashlib
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from ImageFile import ImageFile
+import constants
+
+
+def get_capacity(carrier_path, pass_phrase, bits_per_channel):
+    """
+    Calculates how many payload bytes fit into the carrier as one shard
+    :param carrier_path: Path to the carrier image
+    :param pass_phrase: Phrase used for encoding
+    :param bits_per_channel: Number of bits stored in each colour byte
+    :return: Returns the capacity in bytes
+    """
+    with open(carrier_path, "rb") as input_image:
+        return ImageFile(input_image, pass_phrase, bits_per_channel).get_payload_capacity(sharded=True)
+
+
+def encode_shard(carrier_path, input_path, output_path, pass_phrase, bits_per_channel, shard):
+    """
+    Encodes one shard of the payload into the carrier (runs in a worker process)
+    :param carrier_path: Path to the carrier image
+    :param input_path: Path to the payload
+    :param output_path: Path to the output image
+    :param pass_phrase: Phrase used for encoding
+    :param bits_per_channel: Number of bits stored in each colour byte
+    :param shard: Shard description
+    :return: Returns the path to the output image
+    """
+    with open(carrier_path, "rb") as input_image, open(input_path, "rb") as input_file:
+        ImageFile(input_image, pass_phrase, bits_per_channel).encode_file(input_file, output_path, shard=shard)
+    return output_path
+
+
+def read_shard_header(image_path, pass_phrase):
+    """
+    Reads the header of an image containing a shard (runs in a worker process)
+    :param image_path: Path to the image
+    :param pass_phrase: Phrase used for encoding
+    :return: Returns the header
+    """
+    with open(image_path, "rb") as input_image:
+        header = ImageFile(input_image, pass_phrase).read_header()
+
+    if header["shard"] is None:
+        raise ValueError(f"Image {image_path} does not contain a shard of a multi-carrier payload.")
+    return header
+
+
+def decode_shard(image_path, output_path, pass_phrase):
+    """
+    Decodes one shard and writes it to its position in the output file (runs in a worker process)
+    :param image_path: Path to the image
+    :param output_path: Path to the output file (already created with the size of the payload)
+    :param pass_phrase: Phrase used for encoding
+    """
+    with open(image_path, "rb") as input_image, open(output_path, "r+b") as output_file:
+        ImageFile(input_image, pass_phrase).decode_shard(output_file)
+
+
+class MultiCarrier:
+
+    def __init__(self, pass_phrase, bits_per_channel=1, workers=None):
+        """
+        Method initializes encoding of payloads split into shards over several carrier images
+        :param pass_phrase: Phrase used for encoding/decoding
+        :param bits_per_channel: Number of bits stored in each colour byte (1 - 4)
+        :param workers: Number of worker processes (number of CPUs if None)
+        """
+        self.pass_phrase = pass_phrase
+        self.bits_per_channel = bits_per_channel
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+
+    def encode_file(self, input_path, carrier_paths, output_paths):
+        """
+        Method splits the file into shards sized to the capacity of each carrier (in the given order)
+        and encodes the shards concurrently. Carriers which are not needed are not written.
+        :param input_path: Path to the file to be encoded
+        :param carrier_paths: Paths to the carrier images
+        :param output_paths: Paths to the output images (one for each carrier)
+        :return: Returns list of paths to the written output images
+        """
+        if len(carrier_paths) != len(output_paths):
+            raise ValueError("Number of carriers does not match number of outputs.")
+
+        total_size = os.path.getsize(input_path)
+        digest = self.__get_digest(input_path)
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            capacities = list(executor.map(get_capacity, carrier_paths, [self.pass_phrase] * len(carrier_paths),
+                                           [self.bits_per_channel] * len(carrier_paths)))
+
+            shards = self.__split(total_size, capacities)
+            if shards is None:
+                raise ValueError(f"File is too large to be encoded.")
+
+            futures = []
+            for index, (offset, length) in enumerate(shards):
+                shard = {"index": index, "total": len(shards), "offset": offset, "length": length,
+                         "total_size": total_size, "digest": digest}
+                futures.append(executor.submit(encode_shard, carrier_paths[index], input_path, output_paths[index],
+                                               self.pass_phrase, self.bits_per_channel, shard))
+
+            return [future.result() for future in futures]
+
+    def decode_file(self, image_paths, output_filename):
+        """
+        Method decodes the payload from images containing its shards (in any order),
+        shards are decoded concurrently straight to their positions in the output file
+        :param image_paths: Paths to the images
+        :param output_filename: Name of the decoded file (the extension is added)
+        :return: Returns path to the decoded file
+        """
+        with ProcessPoolExecutor(self.workers) as executor:
+            headers = list(executor.map(read_shard_header, image_paths, [self.pass_phrase] * len(image_paths)))
+            shards = [header["shard"] for header in headers]
+            self.__check_shards(shards)
+
+            output_path = output_filename + "." + headers[0]["extension"]
+            try:
+                with open(output_path, "wb") as output_file:
+                    output_file.truncate(shards[0]["total_size"])
+            except Exception as e:
+                raise ValueError(f"Failed opening file: {e}")
+
+            list(executor.map(decode_shard, image_paths, [output_path] * len(image_paths),
+                              [self.pass_phrase] * len(image_paths)))
+
+        if self.__get_digest(output_path) != shards[0]["digest"]:
+            raise ValueError("Digest of the decoded file does not match.")
+
+        return output_path
+
+    def __split(self, total_size, capacities):
+        """
+        Method splits the payload into shards filling the carriers in order
+        :param total_size: Size of the payload
+        :param capacities: Capacities of the carriers
+        :return: Returns list of (offset, length) pairs, None if the payload does not fit
+        """
+        shards = []
+        offset = 0
+
+        for capacity in capacities:
+            if offset >= total_size and len(shards) > 0:
+                break
+
+            length = min(capacity, total_size - offset)
+            shards.append((offset, length))
+            offset += length
+
+        return shards if offset >= total_size and len(shards) > 0 else None
+
+    def __check_shards(self, shards):
+        """
+        Method checks that the shards belong to the same payload and that all of them are present
+        :param shards: Shard descriptions read from the images
+        """
+        if len(shards) == 0:
+            raise ValueError("No images to decode.")
+
+        first = shards[0]
+        for shard in shards:
+            if (shard["total"], shard["total_size"], shard["digest"]) != (first["total"], first["total_size"], first["digest"]):
+                raise ValueError("Images contain shards of different payloads.")
+
+        indexes = sorted(shard["index"] for shard in shards)
+        if indexes != list(range(first["total"])):
+            raise ValueError("Shards of the payload are missing or duplicated.")
+
+    def __get_digest(self, path):
+        """
+        Method calculates SHA-256 digest of the file
+        :param path: Path to the file
+        :return: Returns the digest
+        """
+        digest = hashlib.sha256()
+
+        with open(path, "rb") as file:
+            while True:
+                data = file.read(constants.BUFFER_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+
+        return digest.digest()
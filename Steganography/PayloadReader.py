@@ -0,0 +1,84 @@
+import io
+
+from io import SEEK_SET, SEEK_CUR, SEEK_END
+
+
+class PayloadReader(io.RawIOBase):
+
+    def __init__(self, image, size):
+        """
+        Method creates a read only file-like view of the payload embedded in the image,
+        every read decodes only the requested range
+        :param image: ImageFile containing the payload
+        :param size: Size of the payload
+        """
+        super().__init__()
+        self.image = image
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self.__check_closed()
+        return self.position
+
+    def seek(self, offset, whence=SEEK_SET):
+        """
+        Method moves the position in the payload
+        :param offset: Offset relative to whence
+        :param whence: SEEK_SET, SEEK_CUR or SEEK_END
+        :return: Returns the new position
+        """
+        self.__check_closed()
+
+        if whence == SEEK_SET:
+            position = offset
+        elif whence == SEEK_CUR:
+            position = self.position + offset
+        elif whence == SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+
+        self.position = position
+        return self.position
+
+    def read(self, size=-1):
+        """
+        Method reads and decodes bytes of the payload from the current position
+        :param size: Number of bytes, all remaining bytes if negative
+        :return: Returns the bytes (empty at the end of the payload)
+        """
+        self.__check_closed()
+
+        if size is None or size < 0:
+            size = self.size - self.position
+
+        data = self.image.read_range(self.position, size)
+        self.position += len(data)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        """
+        Method reads bytes of the payload into the buffer
+        :param buffer: Writable buffer
+        :return: Returns number of bytes read
+        """
+        data = self.read(len(buffer))
+        memoryview(buffer).cast("B")[:len(data)] = data
+        return len(data)
+
+    def __check_closed(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
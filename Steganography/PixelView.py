@@ -0,0 +1,119 @@
+import mmap
+import numpy as np
+
+
+class PixelView:
+
+    def __init__(self, buffer, data_offset, width, height, padding):
+        """
+        Method creates a zero-copy view of the BMP pixel array with row padding sliced off.
+        Rows are kept in the order they are stored in the file (bottom-up BMPs start with the bottom row,
+        top-down BMPs with negative height with the top row), logical byte index i lies in row i // width.
+        :param buffer: Buffer holding the whole image (bytes, bytearray or mmap)
+        :param data_offset: Offset of the pixel array in the file
+        :param width: Width of a row in bytes (without padding)
+        :param height: Height of the image as stored in the header (negative for top-down BMPs)
+        :param padding: Number of padding bytes at the end of each row
+        """
+        self.buffer = buffer
+        self.data_offset = data_offset
+        self.width = width
+        self.height = abs(height)
+        self.top_down = height < 0
+        self.row_length = width + padding
+        self.length = self.width * self.height
+
+        rows = np.frombuffer(buffer, dtype=np.uint8, count=self.height * self.row_length, offset=data_offset)
+        self.pixels = rows.reshape(self.height, self.row_length)[:, :width]
+
+    @classmethod
+    def from_file(cls, file, data_offset, width, height, padding):
+        """
+        Method maps the image file into memory (read only) and creates the view over it,
+        files which can not be mapped are read into memory instead
+        :param file: Opened image file
+        :param data_offset: Offset of the pixel array in the file
+        :param width: Width of a row in bytes (without padding)
+        :param height: Height of the image as stored in the header
+        :param padding: Number of padding bytes at the end of each row
+        :return: Returns PixelView of the file
+        """
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            file.seek(0)
+            buffer = file.read()
+
+        return cls(buffer, data_offset, width, height, padding)
+
+    def get_offset(self, index):
+        """
+        Method maps logical byte index to the offset in the file
+        :param index: Logical index (or numpy array of indexes)
+        :return: Returns the file offset
+        """
+        return self.data_offset + (index // self.width) * self.row_length + index % self.width
+
+    def get_range(self, start, length):
+        """
+        Method reads a range of logical bytes, only rows containing the range are touched
+        :param start: Logical index of the first byte
+        :param length: Number of bytes
+        :return: Returns uint8 array with a copy of the bytes
+        """
+        first_row, offset, rows = self.__get_rows(start, length)
+        return self.pixels[first_row:first_row + rows].reshape(-1)[offset:offset + length].copy()
+
+    def put_range(self, start, values):
+        """
+        Method writes a range of logical bytes (the buffer has to be writable)
+        :param start: Logical index of the first byte
+        :param values: uint8 array of new values
+        """
+        first_row, offset, rows = self.__get_rows(start, len(values))
+        block = self.pixels[first_row:first_row + rows]
+
+        flat = block.reshape(-1)
+        flat[offset:offset + len(values)] = values
+
+        # Without padding the flat array is a view and the values are already written
+        if not np.shares_memory(flat, block):
+            block[:] = flat.reshape(rows, self.width)
+
+    def release(self, start, length):
+        """
+        Method tells the kernel that mapped pages of a processed range are not needed any more,
+        so the resident memory stays bounded while a large file is processed (the data stays in the file)
+        :param start: Logical index of the first byte
+        :param length: Number of bytes
+        """
+        if not isinstance(self.buffer, mmap.mmap) or not hasattr(mmap, "MADV_DONTNEED") or length == 0:
+            return
+
+        first = self.get_offset(start) // mmap.PAGESIZE * mmap.PAGESIZE
+        end = self.get_offset(start + length - 1) + 1
+        self.buffer.madvise(mmap.MADV_DONTNEED, first, end - first)
+
+    def close(self):
+        """
+        Method releases the view and unmaps the file
+        """
+        self.pixels = None
+
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = None
+
+    def __get_rows(self, start, length):
+        """
+        Method finds rows containing the range of logical bytes
+        :param start: Logical index of the first byte
+        :param length: Number of bytes
+        :return: Returns first row, offset of the range in the first row and number of rows
+        """
+        if start < 0 or length < 0 or start + length > self.length:
+            raise ValueError("Range is outside of the pixel array")
+
+        first_row = start // self.width
+        rows = -(-(start + length) // self.width) - first_row
+        return first_row, start - first_row * self.width, rows
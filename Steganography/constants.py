@@ -10,6 +10,24 @@ BYTES_PER_PIXEL = 3
 BITS_IN_BYTE = 8
 
 # Sizes
-BUFFER_SIZE = 4096
+BUFFER_SIZE = 1 << 20
+CHUNK_SIZE = 3 << 18
 EXTENSION_SIZE = 4
-INTEGER_SIZE = 4
\ No newline at end of file
+INTEGER_SIZE = 4
+
+# Header options
+HEADER_MARKER = 0xFF
+HEADER_VERSION = 1
+MAX_BITS_PER_CHANNEL = 4
+FLAG_SHARD = 1
+FLAG_COMPRESSED = 2
+
+# Shard of a multi-carrier payload - index, total shards, offset in the payload, payload size, SHA-256 of the payload
+SHARD_FORMAT = "<HHQQ32s"
+
+# Compression of the payload - method, size of the payload before compression
+COMPRESSION_FORMAT = "<BQ"
+COMPRESSION_METHODS = {"zlib": 1, "lzma": 2, "bz2": 3}
+
+# ioctl request cloning a file (reflink) on Linux
+FICLONE = 0x40049409
\ No newline at end of file
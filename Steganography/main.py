@@ -1,69 +1,156 @@
 import os
+import time
 
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from ImageFile import ImageFile
 validation_folder = "validation/"
 output_folder = "out/"
 decoded_folder = "decoded/"
+carriers = ["weber.bmp"]
 
 password = "bit2025"
 
-
-def encode_test(input_name, extension, pass_phrase):
-
-    try:
-        input_image = open("weber.bmp", "rb")
-    except Exception as e:
-        print(f"Error opening file: weber.bmp \n {e}")
-        return
-
-    try:
-        input_file = open(validation_folder + input_name + "." + extension, "rb")
-    except Exception as e:
-        print(f"Error with file: {validation_folder}{input_name}.{extension} \n {e}")
-        input_image.close()
-        return
-
-    try:
-        image = ImageFile(input_image, pass_phrase)
-        image.encode_file(input_file, output_folder + input_name + "__weber.bmp")
-    except Exception as e:
-        print(f"Error with file: {input_file.name} \n {e}")
-
-    input_image.close()
-    input_file.close()
-
-
-
-def decode_test(input_image, output_filename, pass_phrase):
-
-    try:
-        input_image = open(input_image, "rb")
-    except Exception as e:
-        print(f"Error with file: {input_image} \n {e}")
-        return
-
-    try:
+# Carriers loaded in a worker process - shared memory and ImageFile parsed once per worker
+worker_carriers = {}
+
+
+def init_worker(shared_carriers, pass_phrase):
+    """
+    Initializer of worker processes, attaches shared memory with the carriers
+    :param shared_carriers: List of (carrier name, shared memory name, size)
+    :param pass_phrase: Phrase used for encoding
+    """
+    for carrier, memory_name, size in shared_carriers:
+        memory = shared_memory.SharedMemory(name=memory_name)
+        worker_carriers[carrier] = memory, ImageFile(memory.buf[:size].toreadonly(), pass_phrase)
+
+
+def encode_test(input_path, carrier, output_path):
+    """
+    Encodes one file into the carrier loaded in the worker
+    :param input_path: Path to the file to be encoded
+    :param carrier: Name of the carrier
+    :param output_path: Path to the output image
+    :return: Returns number of encoded bytes
+    """
+    image = worker_carriers[carrier][1]
+
+    with open(input_path, "rb") as input_file:
+        image.encode_file(input_file, output_path)
+
+    return os.path.getsize(input_path)
+
+
+def decode_test(input_path, output_filename, pass_phrase):
+    """
+    Decodes the file hidden in the image
+    :param input_path: Path to the image
+    :param output_filename: Name of the decoded file (the extension is added)
+    :param pass_phrase: Phrase used for decoding
+    :return: Returns number of decoded bytes
+    """
+    with open(input_path, "rb") as input_image:
         image = ImageFile(input_image, pass_phrase)
+        header = image.read_header()
         image.decode_file(output_filename)
-    except Exception as e:
-        print(f"Error with file: {input_image.name} \n {e}")
-
-    input_image.close()
+        image.close()
+
+    return header["size"]
+
+
+def run_jobs(executor, jobs, action):
+    """
+    Runs jobs in the process pool, reports timing of every job and collects failures
+    :param executor: Process pool
+    :param jobs: List of (name, function, arguments)
+    :param action: Name of the action for the report
+    :return: Returns list of failures (name, error)
+    """
+    failures = []
+    total_bytes = 0
+    start = time.perf_counter()
+
+    futures = [(name, executor.submit(timed_job, function, *arguments)) for name, function, arguments in jobs]
+
+    for name, future in futures:
+        try:
+            size, seconds = future.result()
+        except Exception as e:
+            failures.append((name, e))
+            continue
+
+        total_bytes += size
+        print(f"{action} {name}: {size} B in {seconds * 1000:.1f} ms ({size / seconds / 1e6 if seconds > 0 else 0:.1f} MB/s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"{action} {len(jobs) - len(failures)}/{len(jobs)} files, {total_bytes / 1e6:.2f} MB in {elapsed:.2f} s "
+          f"({total_bytes / elapsed / 1e6 if elapsed > 0 else 0:.1f} MB/s)")
+    return failures
+
+
+def timed_job(function, *arguments):
+    """
+    Runs the job and measures its time
+    :param function: Job function returning number of processed bytes
+    :param arguments: Arguments of the job
+    :return: Returns number of processed bytes and elapsed seconds
+    """
+    start = time.perf_counter()
+    size = function(*arguments)
+    return size, time.perf_counter() - start
+
+
+def whole_test(workers=None):
+    """
+    Encodes all files from the validation folder into all carriers and decodes all images from the output folder.
+    Carriers are loaded once into shared memory, encoding and decoding run in a process pool.
+    :param workers: Number of worker processes (number of CPUs if None)
+    :return: Returns list of failures (name, error)
+    """
+    memories = []
+    shared_carriers = []
 
+    try:
+        # load carriers into shared memory
+        for carrier in carriers:
+            size = os.path.getsize(carrier)
+            memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            memories.append(memory)
+
+            with open(carrier, "rb") as input_image:
+                input_image.readinto(memory.buf[:size])
+            shared_carriers.append((carrier, memory.name, size))
+
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(shared_carriers, password)) as executor:
+            # encode files from directory into every carrier
+            jobs = []
+            for file in sorted(os.listdir(validation_folder)):
+                input_name = file.split(".")[0]
+                for carrier in carriers:
+                    carrier_name = os.path.splitext(os.path.basename(carrier))[0]
+                    output_path = output_folder + input_name + "__" + carrier_name + ".bmp"
+                    jobs.append((validation_folder + file, encode_test, (validation_folder + file, carrier, output_path)))
+
+            failures = run_jobs(executor, jobs, "Encoded")
+
+            # decode files from directory
+            jobs = []
+            for file in sorted(os.listdir(output_folder)):
+                output_name = file.split("__")[0]
+                jobs.append((output_folder + file, decode_test, (output_folder + file, decoded_folder + output_name, password)))
+
+            failures += run_jobs(executor, jobs, "Decoded")
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    for name, error in failures:
+        print(f"Error with file: {name} \n {error}")
+
+    return failures
 
-def whole_test():
-    #load files from directory and encode them
-    for file in os.listdir(validation_folder):
-        file_split = file.split(".")
-        input_name = file_split[0]
-        extension = file_split[1]
-        encode_test(input_name, extension, password)
-
-    # decode files from directory
-    for file in os.listdir(output_folder):
-        file_split = file.split("__")
-        output_name = file_split[0]
-        decode_test(output_folder + file, decoded_folder + output_name, password)
 
 if __name__ == "__main__":
-    whole_test()
\ No newline at end of file
+    whole_test()
@@ -1,9 +1,19 @@
 import subprocess
 import unittest
+import tempfile
+import shutil
+import struct
+import zlib
+import sys
 import os
 
 # pip install opencv-python if not installed
 import cv2
+import numpy as np
+
+sys.path.insert(0, "..")
+from ImageFile import ImageFile
+from MultiCarrier import MultiCarrier
 
 
 STEGANOGRAPHY_IMG = "../weber.bmp"
@@ -72,4 +82,237 @@ class SteganographyTester(unittest.TestCase):
                     break
 
 
+def create_carrier(path, width, height, top_down=False, seed=0):
+    """
+    Writes a 24-bit BMP with random pixels (including the row padding)
+    :param path: Path to the image
+    :param width: Width in pixels
+    :param height: Height in pixels
+    :param top_down: True to store rows from the top (negative height in the header)
+    :param seed: Seed of the random pixels
+    """
+    row_length = (width * 3 + 3) // 4 * 4
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, row_length), dtype=np.uint8)
+
+    with open(path, "wb") as fw:
+        fw.write(struct.pack("<2sIHHI", b"BM", 54 + pixels.size, 0, 0, 54))
+        fw.write(struct.pack("<IiiHHIIiiII", 40, width, -height if top_down else height, 1, 24, 0, pixels.size, 2835, 2835, 0, 0))
+        fw.write(pixels.tobytes())
+
+
+class ImageFileTester(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.carrier = os.path.join(self.folder, "carrier.bmp")
+        create_carrier(self.carrier, 200, 150)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_payload(self, data, name="payload.bin"):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as fw:
+            fw.write(data)
+        return path
+
+    def encode(self, payload_path, output_path, carrier=None, in_place=False, **options):
+        with open(carrier or self.carrier, "rb") as fr, open(payload_path, "rb") as payload:
+            image = ImageFile(fr, "test", **options)
+            image.encode_file(payload, output_path, in_place=in_place, chunk_size=1000)
+            image.close()
+
+    def decode(self, image_path):
+        """
+        Decodes the image and returns the header and the decoded bytes
+        """
+        output_name = os.path.join(self.folder, "decoded")
+        with open(image_path, "rb") as fr:
+            image = ImageFile(fr, "test")
+            header = image.read_header()
+            image.decode_file(output_name, chunk_size=4096)
+            image.close()
+
+        with open(output_name + "." + header["extension"], "rb") as fr:
+            return header, fr.read()
+
+    def test_bits_per_channel_round_trip(self):
+        """
+        This test encodes and decodes payloads of odd lengths with every supported depth
+        """
+        output_path = os.path.join(self.folder, "out.bmp")
+
+        for bits_per_channel in range(1, 5):
+            for length in (0, 1, 63, 64, 5001):
+                data = np.random.default_rng(length).bytes(length)
+                self.encode(self.write_payload(data), output_path, bits_per_channel=bits_per_channel)
+
+                header, decoded = self.decode(output_path)
+                assert header["bits_per_channel"] == bits_per_channel
+                assert header["extension"] == "bin"
+                assert decoded == data
+
+    def test_bits_per_channel_capacity(self):
+        """
+        This test checks that a payload of the reported capacity fits and one byte more does not
+        """
+        output_path = os.path.join(self.folder, "out.bmp")
+
+        for bits_per_channel in range(1, 5):
+            with open(self.carrier, "rb") as fr:
+                capacity = ImageFile(fr, "test", bits_per_channel).get_payload_capacity()
+
+            self.encode(self.write_payload(bytes(capacity)), output_path, bits_per_channel=bits_per_channel)
+            assert self.decode(output_path)[1] == bytes(capacity)
+
+            with self.assertRaises(ValueError):
+                self.encode(self.write_payload(bytes(capacity + 1)), output_path, bits_per_channel=bits_per_channel)
+
+    def test_padded_and_top_down_carriers(self):
+        """
+        This test encodes into carriers with row padding (odd width) and with rows stored from the top,
+        the padding bytes must stay untouched
+        """
+        data = np.random.default_rng(1).bytes(1500)
+        payload_path = self.write_payload(data)
+        output_path = os.path.join(self.folder, "out.bmp")
+
+        for width, top_down in ((101, False), (101, True), (64, True)):
+            carrier = os.path.join(self.folder, f"carrier_{width}_{top_down}.bmp")
+            create_carrier(carrier, width, 90, top_down, seed=width)
+
+            for bits_per_channel in (1, 3):
+                self.encode(payload_path, output_path, carrier, bits_per_channel=bits_per_channel)
+                assert self.decode(output_path)[1] == data
+
+                with open(carrier, "rb") as fr:
+                    original = np.frombuffer(fr.read()[54:], dtype=np.uint8)
+                with open(output_path, "rb") as fr:
+                    encoded = np.frombuffer(fr.read()[54:], dtype=np.uint8)
+
+                row_length = (width * 3 + 3) // 4 * 4
+                original, encoded = original.reshape(90, row_length), encoded.reshape(90, row_length)
+                assert (original[:, width * 3:] == encoded[:, width * 3:]).all()
+                assert (original[:, :width * 3] >> bits_per_channel == encoded[:, :width * 3] >> bits_per_channel).all()
+
+    def test_sharded_decode_in_any_order(self):
+        """
+        This test splits a payload over several carriers and decodes the shards passed in shuffled order,
+        a missing shard must be detected
+        """
+        carriers, outputs = [], []
+        for i, width in enumerate((60, 101, 80)):
+            carriers.append(os.path.join(self.folder, f"carrier_{i}.bmp"))
+            outputs.append(os.path.join(self.folder, f"shard_{i}.bmp"))
+            create_carrier(carriers[-1], width, 70, top_down=i == 1, seed=i)
+
+        multi_carrier = MultiCarrier("test", bits_per_channel=2, workers=2)
+        data = np.random.default_rng(2).bytes(9000)
+        written = multi_carrier.encode_file(self.write_payload(data), carriers, outputs)
+        assert len(written) == 3
+
+        output_path = multi_carrier.decode_file([written[2], written[0], written[1]], os.path.join(self.folder, "joined"))
+        with open(output_path, "rb") as fr:
+            assert fr.read() == data
+
+        with self.assertRaises(ValueError):
+            multi_carrier.decode_file([written[2], written[0]], os.path.join(self.folder, "joined"))
+
+    def test_compression_round_trip(self):
+        """
+        This test encodes a compressible payload larger than the carrier with every compression method,
+        the decoded file must match and the header must describe the compression
+        """
+        data = b"".join(b"record %d\n" % (i % 100) for i in range(20000))
+        payload_path = self.write_payload(data, "payload.txt")
+        output_path = os.path.join(self.folder, "out.bmp")
+
+        with open(self.carrier, "rb") as fr:
+            assert len(data) > ImageFile(fr, "test", 4).get_payload_capacity()
+
+        for method in ("zlib", "lzma", "bz2"):
+            for bits_per_channel in (1, 4):
+                self.encode(payload_path, output_path, bits_per_channel=bits_per_channel, compression=method, compression_level=9)
+
+                header, decoded = self.decode(output_path)
+                assert header["compression"] == {"method": method, "size": len(data)}
+                assert header["extension"] == "txt"
+                assert decoded == data
+
+    def test_compression_capacity(self):
+        """
+        This test checks that the capacity reported with compression includes the compression header
+        """
+        output_path = os.path.join(self.folder, "out.bmp")
+
+        with open(self.carrier, "rb") as fr:
+            capacity = ImageFile(fr, "test", compression="zlib").get_payload_capacity()
+
+        # Random data does not compress, find the longest prefix whose compressed stream fills the capacity
+        data = np.random.default_rng(3).bytes(capacity)
+        length = capacity
+        while len(zlib.compress(data[:length])) > capacity:
+            length -= 1
+
+        self.encode(self.write_payload(data[:length]), output_path, compression="zlib")
+        assert self.decode(output_path)[1] == data[:length]
+
+        with self.assertRaises(ValueError):
+            self.encode(self.write_payload(data[:length + 1]), output_path, compression="zlib")
+
+    def test_read_range_unaligned(self):
+        """
+        This test reads ranges of the payload at offsets which do not start at a carrier byte (depth 3)
+        and reads the payload through the file-like object
+        """
+        data = np.random.default_rng(4).bytes(20000)
+        output_path = os.path.join(self.folder, "out.bmp")
+        self.encode(self.write_payload(data), output_path, bits_per_channel=3)
+
+        with open(output_path, "rb") as fr:
+            image = ImageFile(fr, "test")
+
+            for offset, length in ((0, 1), (1, 1), (2, 7), (64, 64), (65, 130), (12347, 999), (19998, 10), (20000, 5)):
+                assert image.read_range(offset, length) == data[offset:offset + length]
+
+            payload = image.open_payload()
+            payload.seek(-10, os.SEEK_END)
+            assert payload.read() == data[-10:]
+            payload.seek(5)
+            assert payload.read(100) == data[5:105]
+            assert payload.tell() == 105
+            payload.close()
+            image.close()
+
+    def test_read_range_compressed(self):
+        """
+        This test checks that ranges of a compressed payload can not be read
+        """
+        output_path = os.path.join(self.folder, "out.bmp")
+        self.encode(self.write_payload(bytes(1000)), output_path, compression="zlib")
+
+        with open(output_path, "rb") as fr:
+            image = ImageFile(fr, "test")
+            with self.assertRaises(ValueError):
+                image.read_range(0, 10)
+            image.close()
+
+    def test_in_place_matches_copy(self):
+        """
+        This test checks that encoding over a cloned carrier gives the same image as the regular copy
+        """
+        data = np.random.default_rng(5).bytes(4000)
+        payload_path = self.write_payload(data)
+        copy_path = os.path.join(self.folder, "copy.bmp")
+        in_place_path = os.path.join(self.folder, "in_place.bmp")
+
+        for bits_per_channel in (1, 3):
+            self.encode(payload_path, copy_path, bits_per_channel=bits_per_channel)
+            self.encode(payload_path, in_place_path, in_place=True, bits_per_channel=bits_per_channel)
+
+            with open(copy_path, "rb") as fr:
+                copy_bytes = fr.read()
+            with open(in_place_path, "rb") as fr:
+                assert fr.read() == copy_bytes
 
+            assert self.decode(in_place_path)[1] == data